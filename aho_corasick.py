@@ -0,0 +1,65 @@
+"""
+A small Aho-Corasick automaton that finds all occurrences of many strings in a text with a single scan, no matter how many strings there are.
+"""
+from collections import deque
+
+def fold_char(char):
+	# lowercase one character at a time, so that match positions stay valid
+	lower = char.lower()
+	return lower if len(lower) == 1 else char
+
+class Automaton:
+	def __init__(self, patterns, ignore_case=False):
+		self.patterns = list(patterns)
+		self.ignore_case = ignore_case
+		self.transitions = [{}]
+		self.fail = [0]
+		self.outputs = [[]]
+
+		# build a trie of all patterns
+		for index, pattern in enumerate(self.patterns):
+			if pattern == "":
+				continue
+			node = 0
+			for char in pattern:
+				if ignore_case:
+					char = fold_char(char)
+				if char not in self.transitions[node]:
+					self.transitions.append({})
+					self.fail.append(0)
+					self.outputs.append([])
+					self.transitions[node][char] = len(self.transitions) - 1
+				node = self.transitions[node][char]
+			self.outputs[node].append(index)
+
+		# add failure links in breadth-first order, so that every node
+		# also reports the patterns that end in its longest proper suffix
+		queue = deque(self.transitions[0].values())
+		while queue:
+			node = queue.popleft()
+			for char, child in self.transitions[node].items():
+				queue.append(child)
+				fallback = self.fail[node]
+				while fallback and char not in self.transitions[fallback]:
+					fallback = self.fail[fallback]
+				self.fail[child] = self.transitions[fallback].get(char, 0)
+				if self.fail[child] == child:
+					self.fail[child] = 0
+				self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+	def iter_matches(self, text):
+		"""
+		Yields (start, end, pattern_index) for every occurrence of every pattern in the text, including overlapping ones, ordered by end position.
+		"""
+		transitions = self.transitions
+		fail = self.fail
+		outputs = self.outputs
+		node = 0
+		for i, char in enumerate(text):
+			if self.ignore_case:
+				char = fold_char(char)
+			while node and char not in transitions[node]:
+				node = fail[node]
+			node = transitions[node].get(char, 0)
+			for index in outputs[node]:
+				yield i + 1 - len(self.patterns[index]), i + 1, index
@@ -2,9 +2,11 @@
 Experimanetal script that analyzes changes made to existing translations, rather than analyzing newly added translations. Saves its output as table2.html to not conflict with make_table.py.
 """
 import requests
+import http_client
 import json
 import os
 import sys
+import openai_scheduler
 from github import Github
 from urllib.parse import urlparse
 from markdown2 import markdown
@@ -32,7 +34,7 @@ def get_json_files(pr):
 
 def download_file(url, token):
 	headers = {"Authorization": f"token {token}"}
-	response = requests.get(url, headers=headers)
+	response = http_client.get(url, headers=headers)
 	response.raise_for_status()
 	return response.text
 
@@ -94,16 +96,24 @@ def explain_difference(
 	}
 
 	try:
-		response = requests.post(
+		response = http_client.post(
 			"https://api.openai.com/v1/chat/completions",
 			headers=headers,
 			json=data,
 		)
+		openai_scheduler.scheduler.record_response(response)
 		response.raise_for_status()
 		explanation = response.json()["choices"][0]["message"]["content"].strip()
 		return explanation
 	except requests.exceptions.RequestException as e:
-		return f"Error calling OpenAI API for {key}: {str(e)}, response: {e.response.text if e.response else None}"
+		# let the scheduler retry rate-limited requests
+		if e.response is not None and e.response.status_code == 429:
+			raise
+		return get_error_message(key, e)
+
+
+def get_error_message(key, e):
+	return f"Error calling OpenAI API for {key}: {str(e)}, response: {e.response.text if e.response else None}"
 
 
 def create_html_table(differences, openai_api_key):
@@ -128,9 +138,20 @@ def create_html_table(differences, openai_api_key):
 		</tr>
 	"""
 
+	# request all explanations at once, then add them to the table in order
+	futures = {
+		key: openai_scheduler.scheduler.submit(explain_difference, key, base_value, pr_value, en_value, openai_api_key)
+		for key, (base_value, pr_value, en_value) in differences.items()
+	}
+
 	for key, (base_value, pr_value, en_value) in differences.items():
+		try:
+			result = futures[key].result()
+		except requests.exceptions.RequestException as e:
+			# still rate limited after all retries, only this row shows the error
+			result = get_error_message(key, e)
 		explanation = markdown(
-			explain_difference(key, base_value, pr_value, en_value, openai_api_key),
+			result,
 			extras=[
 				"fenced-code-blocks",
 				"tables",
@@ -198,6 +219,7 @@ def main(pr_url):
 			with open("table2.html", "w", encoding="utf-8") as f:
 				f.write(html_table)
 			print("Table has been saved to table2.html")
+			http_client.print_stats()
 
 	except requests.exceptions.HTTPError as e:
 		print(f"HTTP Error occurred: {e}")
@@ -0,0 +1,138 @@
+"""
+Analyzes several translations at once and writes one table per translation, plus an index.html that links to all of them. Takes pull request URLs and/or local langfiles named after their language (e.g. de_de.json). Each translation gets its own workspace in the batch folder and is analyzed in its own process, while the caches for language files, Google Translate, embeddings and mcnames are shared between all of them.
+Usage: python batch_make_tables.py <PR URL or file>...
+Note that the rate limits are per process. Rate-limited requests get retried, but more processes still mean more of them.
+"""
+import concurrent.futures
+import html
+import importlib
+import multiprocessing
+import os
+import shutil
+import sys
+import download_pending
+import gpt_embeddings
+import gpt_extract_mcnames
+import html_table
+import langfiles
+import rules
+import workspace
+
+BATCH_FOLDER = "batch"
+MAX_PROCESSES = 4
+
+def get_workspace_name(source):
+	# the PR number for pull requests, the file name for local files
+	if source.startswith("https://"):
+		return source.rstrip("/").split("/")[-1]
+	return os.path.splitext(os.path.basename(source))[0]
+
+def start_worker(directory, log_name):
+	# each process only sees its own workspace and writes its output to a log there
+	workspace.directory = directory
+	log = open(workspace.get_path(log_name), "w", encoding="utf-8")
+	sys.stdout = log
+	sys.stderr = log
+
+def prepare(source, directory):
+	start_worker(directory, "prepare.log")
+	if source.startswith("https://"):
+		download_pending.download_pending(source)
+	else:
+		shutil.copyfile(source, workspace.get_path("pending.json"))
+		with open(workspace.get_path("pending_lang.txt"), "w", encoding="utf-8") as f:
+			f.write(get_workspace_name(source).lower())
+	if not os.path.isfile(workspace.get_path("pending.json")):
+		raise FileNotFoundError(f"No pending translation found in {source}")
+	# return how many strings still need an mcnames analysis, so the cost can be confirmed once for all translations
+	return len(gpt_extract_mcnames.get_missing_keys(gpt_extract_mcnames.load_cache()))
+
+def analyze(directory, confirmed):
+	start_worker(directory, "analyze.log")
+	gpt_extract_mcnames.confirmed = confirmed
+	# the translations are already analyzed in parallel, so each one checks its strings in a single process
+	rules.MAX_PROCESSES = 1
+	# make_table.py does the whole analysis when it's imported
+	make_table = importlib.import_module("make_table")
+	evals = make_table.evals
+	return {
+		"langcode": langfiles.get_langcode(),
+		"strings": len(make_table.pending),
+		"errors": sum(len(evaluation.get("errors", [])) for key, evaluation in evals.items() if key != "_general_"),
+		"warnings": sum(len(evaluation.get("warnings", [])) for key, evaluation in evals.items() if key != "_general_"),
+	}
+
+def run_in_new_process(function, *args):
+	# each task gets a fresh process, since every module keeps the data of one translation
+	with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+		return executor.submit(function, *args).result()
+
+def run_all(function, tasks):
+	# runs function(*args) for each source in parallel, returns the results and errors by source
+	results = {}
+	errors = {}
+	with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_PROCESSES) as executor:
+		future_to_source = {executor.submit(run_in_new_process, function, *args): source for source, args in tasks.items()}
+		for i, future in enumerate(concurrent.futures.as_completed(future_to_source), 1):
+			source = future_to_source[future]
+			try:
+				results[source] = future.result()
+				print(f"[{i}/{len(tasks)}] Finished {source}")
+			except Exception as e:
+				errors[source] = e
+				print(f"[{i}/{len(tasks)}] Failed {source}: {e}")
+	return results, errors
+
+def write_index(sources, directories, summaries, errors):
+	with open(os.path.join(BATCH_FOLDER, "index.html"), "w", encoding="utf-8") as f:
+		f.write("<!DOCTYPE html>\n")
+		html_table.write_table_start(f, ["Translation", "Language", "Strings", "Errors", "Warnings", "Status"])
+		for source in sources:
+			name = os.path.basename(directories[source])
+			if source in summaries:
+				summary = summaries[source]
+				link = f"<a href='{html.escape(name)}/table.html'>{html.escape(source)}</a>"
+				html_table.write_table_row(f, [link, summary["langcode"], summary["strings"], summary["errors"], summary["warnings"], "Done"])
+			else:
+				log_name = "analyze.log" if os.path.isfile(os.path.join(directories[source], "analyze.log")) else "prepare.log"
+				status = f"<a href='{html.escape(name)}/{log_name}'>Failed</a>: {html.escape(str(errors[source]))}"
+				html_table.write_table_row(f, [html.escape(source), "", "", "", "", status])
+		html_table.write_table_end(f)
+
+if __name__ == "__main__":
+	sources = list(dict.fromkeys(sys.argv[1:]))
+	if not sources:
+		print("Usage: python batch_make_tables.py <PR URL or file>...")
+		exit()
+
+	# give each translation its own workspace
+	directories = {}
+	for source in sources:
+		name = get_workspace_name(source)
+		directory = os.path.join(BATCH_FOLDER, name)
+		suffix = 2
+		while directory in directories.values():
+			directory = os.path.join(BATCH_FOLDER, f"{name}_{suffix}")
+			suffix += 1
+		os.makedirs(directory, exist_ok=True)
+		directories[source] = directory
+
+	# set up the shared embedding store once, before several processes use it
+	gpt_embeddings.get_store()
+
+	print(f"Downloading {len(sources)} translations...")
+	missing_counts, errors = run_all(prepare, {source: (source, directories[source]) for source in sources})
+
+	# ask once for all translations, instead of once per process
+	confirmed = True
+	total_missing = sum(missing_counts.values())
+	if total_missing > 0:
+		confirm = input(f"{total_missing} strings have no mcnames analysis yet. Analyzing them with {gpt_extract_mcnames.model} will cost approximately ${gpt_extract_mcnames.get_cost_estimate(total_missing)}. Continue? (Y/n) ")
+		confirmed = confirm.lower() != "n"
+
+	print(f"Analyzing {len(missing_counts)} translations...")
+	summaries, analyze_errors = run_all(analyze, {source: (directories[source], confirmed) for source in sources if source in missing_counts})
+	errors.update(analyze_errors)
+
+	write_index(sources, directories, summaries, errors)
+	print(f"Saved {len(summaries)} tables, see {os.path.join(BATCH_FOLDER, 'index.html')}")
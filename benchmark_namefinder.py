@@ -0,0 +1,72 @@
+"""
+Benchmarks the trie pattern in namefinder.py against the plain alternation of all names that it used to use. Uses the real names if wiki-data.json is available, otherwise synthetic ones, and synthetic texts either way.
+Usage: python benchmark_namefinder.py [text count] (default: 1000)
+"""
+import random
+import re
+import string
+import sys
+import time
+import namefinder
+
+def make_word(rng):
+	return rng.choice(string.ascii_uppercase) + "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 10)))
+
+def get_names(rng):
+	try:
+		return namefinder.get_names_list()
+	except FileNotFoundError:
+		print("wiki-data.json not found, using synthetic names.")
+		return [make_word(rng) + rng.choice(["", "Hack", "Legit", "ESP"]) for _ in range(450)]
+
+def make_texts(rng, names, count):
+	# mostly ordinary words, with a name every ten words or so
+	return [" ".join(rng.choice(names) if rng.random() < 0.1 else make_word(rng).lower() for _ in range(rng.randint(5, 40))) for _ in range(count)]
+
+def time_findall(pattern, texts, repeats=3):
+	start = time.perf_counter()
+	for _ in range(repeats):
+		for text in texts:
+			pattern.findall(text)
+	return (time.perf_counter() - start) / repeats
+
+def time_cached(texts):
+	# like evaluate.py and make_table.py, which look at the same texts several times
+	namefinder.find_names.cache_clear()
+	times = []
+	for _ in range(2):
+		start = time.perf_counter()
+		for text in texts:
+			namefinder.get_names(text)
+		times.append(time.perf_counter() - start)
+	return times
+
+if __name__ == "__main__":
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	rng = random.Random(0)
+	names = get_names(rng)
+	texts = make_texts(rng, names, count)
+
+	start = time.perf_counter()
+	alternation = re.compile('|'.join(map(re.escape, names)))
+	alternation_compile_time = time.perf_counter() - start
+	start = time.perf_counter()
+	trie = re.compile(namefinder.build_trie_pattern(names))
+	trie_compile_time = time.perf_counter() - start
+	longest_first = re.compile('|'.join(map(re.escape, sorted(names, key=len, reverse=True))))
+
+	# the trie pattern always finds the longest name, the alternation finds the first one in the list
+	mismatches = sum(trie.findall(text) != longest_first.findall(text) for text in texts)
+	changed = sum(trie.findall(text) != alternation.findall(text) for text in texts)
+	print(f"{len(names)} names, {count} texts")
+	print(f"Texts where the trie doesn't find the longest names: {mismatches}")
+	print(f"Texts where the longest names differ from the alternation: {changed}")
+	print(f"Compile: alternation {alternation_compile_time * 1000:.1f}ms, trie {trie_compile_time * 1000:.1f}ms")
+
+	alternation_time = time_findall(alternation, texts)
+	trie_time = time_findall(trie, texts)
+	print(f"Search: alternation {alternation_time * 1000:.1f}ms, trie {trie_time * 1000:.1f}ms ({alternation_time / trie_time:.1f}x faster)")
+
+	namefinder.pattern = trie
+	first_time, cached_time = time_cached(texts)
+	print(f"namefinder.get_names: first pass {first_time * 1000:.1f}ms, second pass from the LRU cache {cached_time * 1000:.1f}ms")
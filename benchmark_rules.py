@@ -0,0 +1,80 @@
+"""
+Benchmarks the rules in rules.py on a large synthetic language file, once in a single process and once split across processes, and checks that both give the same evaluations.
+Usage: python benchmark_rules.py [string count] (default: 50000)
+"""
+import random
+import re
+import string
+import sys
+import time
+import namefinder
+import rules
+
+def make_word(rng):
+	return rng.choice(string.ascii_uppercase) + "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 10)))
+
+def get_feature_names(rng):
+	try:
+		return namefinder.get_names_list()
+	except FileNotFoundError:
+		print("wiki-data.json not found, using synthetic names.")
+		return [make_word(rng) + rng.choice(["", "Hack", "Legit", "ESP"]) for _ in range(450)]
+
+def make_text(rng, names):
+	# ordinary words with a name, formatting code or line break every now and then
+	words = []
+	for _ in range(rng.randint(5, 40)):
+		roll = rng.random()
+		if roll < 0.1:
+			words.append(rng.choice(names))
+		elif roll < 0.12:
+			words.append(rng.choice(["§c", "§r", "%s", "%d", "\n"]))
+		else:
+			words.append(make_word(rng).lower())
+	return " ".join(words)
+
+def make_files(rng, names, count):
+	# the pending file drops, lowercases or swaps a few things, so that every rule has something to report
+	original = {}
+	pending = {}
+	for i in range(count):
+		key = f"description.wurst.synthetic.{i}"
+		original[key] = make_text(rng, names)
+		text = original[key]
+		roll = rng.random()
+		if roll < 0.05:
+			text = text.lower()
+		elif roll < 0.1:
+			text = text.replace("§c", "").replace("\n", " ")
+		elif roll < 0.15:
+			text = re.sub(r"\b[A-Z]\w+", "", text, count=1)
+		pending[key] = text
+	return original, pending
+
+def time_evaluation(function, keys):
+	for name in rules.rule_times:
+		rules.rule_times[name] = 0.0
+	start = time.perf_counter()
+	evaluations = function(keys)
+	return evaluations, time.perf_counter() - start
+
+if __name__ == "__main__":
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+	rng = random.Random(0)
+	names = get_feature_names(rng)
+	original, pending = make_files(rng, names, count)
+	namefinder.pattern = re.compile(namefinder.build_trie_pattern(names))
+	rules.init(original, pending, {}, names)
+	keys = list(pending.keys())
+	print(f"{len(names)} names, {count} strings, up to {rules.get_process_count(count)} processes")
+
+	single, single_time = time_evaluation(rules.evaluate_keys, keys)
+	print(f"Single process: {single_time:.2f}s")
+	rules.print_times()
+	namefinder.find_names.cache_clear()
+	rules.start_workers(count)
+	parallel, parallel_time = time_evaluation(rules.evaluate_keys_in_parallel, keys)
+	print(f"Parallel: {parallel_time:.2f}s ({single_time / parallel_time:.1f}x faster)")
+	rules.print_times()
+	rules.stop_workers()
+	print(f"Same evaluations in the same order: {list(single.items()) == list(parallel.items())}")
@@ -0,0 +1,27 @@
+"""
+Benchmarks how long the utility scripts take to start, i.e. to import everything they need before doing any actual work. Each import runs in a fresh Python process, so nothing is cached between runs.
+Usage: python benchmark_startup.py [runs] (default: 10)
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+modules = ["check_mc_translation", "download_pending"]
+
+def time_startup(code, runs):
+	times = []
+	for _ in range(runs):
+		start = time.perf_counter()
+		subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+		times.append(time.perf_counter() - start)
+	return statistics.median(times)
+
+if __name__ == "__main__":
+	runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+	baseline = time_startup("pass", runs)
+	print(f"Python interpreter: {baseline:.3f}s")
+	for module in modules:
+		startup_time = time_startup(f"import {module}", runs)
+		print(f"{module}.py: {startup_time:.3f}s ({startup_time - baseline:.3f}s for imports)")
@@ -0,0 +1,68 @@
+"""
+Benchmarks the streaming table writer in html_table.py against the old pandas approach that make_table.py used to build table.html. Uses synthetic rows, so no pending translation is needed.
+Usage: python benchmark_table.py [row counts...] (default: 1000 10000 100000)
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import html_table
+
+columns = ["Key", "Evaluation", "Pending", "Reverse-Translated", "Original"]
+
+def make_rows(count):
+	for i in range(count):
+		yield [
+			f"description.wurst.hack.synthetic{i}",
+			"<span class='info'><b>Info:</b>&nbsp;This string has not been translated.</span>",
+			f"Synthetischer Text Nummer {i} mit <mark class='code'>§c</mark>Farbcodes<mark class='code'>§r</mark>.",
+			f"Synthetic text number {i} with <mark class='code'>§c</mark>color codes<mark class='code'>§r</mark>.",
+			f"Synthetic text number {i} with <mark class='code'>§c</mark>color codes<mark class='code'>§r</mark>.",
+		]
+
+def render_streaming(count, f):
+	html_table.write_table_start(f, columns)
+	for row in make_rows(count):
+		html_table.write_table_row(f, row)
+	html_table.write_table_end(f)
+
+def render_pandas(count, f):
+	import pandas as pd
+	df = pd.DataFrame(columns=columns)
+	for row in make_rows(count):
+		df = pd.concat([df, pd.DataFrame(dict(zip(columns, row)), index=[0])])
+	f.write(df.to_html(index=False, justify='center', escape=False))
+
+def time_render(render, count):
+	with tempfile.TemporaryDirectory() as tmp:
+		with open(os.path.join(tmp, "table.html"), 'w', encoding='utf-8') as f:
+			start = time.perf_counter()
+			render(count, f)
+			return time.perf_counter() - start
+
+def check_identical(count):
+	streamed = io.StringIO()
+	render_streaming(count, streamed)
+	old = io.StringIO()
+	render_pandas(count, old)
+	return streamed.getvalue() == old.getvalue()
+
+if __name__ == "__main__":
+	counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+	try:
+		import pandas
+		has_pandas = True
+	except ImportError:
+		has_pandas = False
+		print("pandas is not installed, only timing the streaming writer.")
+
+	if has_pandas:
+		print(f"Output identical to pandas: {check_identical(100)}")
+	for count in counts:
+		streaming_time = time_render(render_streaming, count)
+		line = f"{count} rows: streaming {streaming_time:.3f}s"
+		if has_pandas:
+			pandas_time = time_render(render_pandas, count)
+			line += f", pandas {pandas_time:.3f}s ({pandas_time / streaming_time:.1f}x slower)"
+		print(line)
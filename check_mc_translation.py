@@ -3,7 +3,7 @@ A small utility script to check how Minecraft translates a given string.
 """
 import i18n
 import sys
-from langfiles import langcode
+import langfiles
 
 if __name__ == "__main__":
 	if len(sys.argv) < 2:
@@ -15,5 +15,5 @@ if __name__ == "__main__":
 
 	for key in keys:
 		print(f"Key: {key}")
-		translated = i18n.translate(key, langcode)
+		translated = i18n.translate(key, langfiles.get_langcode())
 		print(f"Value: {translated}")
@@ -0,0 +1,50 @@
+"""
+Saves a dict that is being filled up over time to a JSON file, without rewriting the whole file after every single change. Files are written to a temporary file first and then renamed, so a crash can never leave a truncated JSON file behind.
+"""
+import json
+import os
+import time
+import file_lock
+
+def write_json_atomic(path, data):
+	# the process ID keeps processes that write the same file at the same time from sharing a temporary file
+	temp_path = f"{path}.{os.getpid()}.tmp"
+	with open(temp_path, "w", encoding="utf-8") as f:
+		json.dump(data, f, indent=2)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(temp_path, path)
+
+class Checkpointer:
+	"""
+	Call update() after each change to data. The file is written once `batch_size` changes have piled up or `interval` seconds have passed since the last write, and once more when the with block is left, even if it's left because of an error. Entries that other processes have saved to the same file in the meantime are kept.
+	"""
+	def __init__(self, path, data, interval=10, batch_size=100):
+		self.path = path
+		self.data = data
+		self.interval = interval
+		self.batch_size = batch_size
+		self.unsaved_changes = 0
+		self.last_flush = time.monotonic()
+
+	def update(self):
+		self.unsaved_changes += 1
+		if self.unsaved_changes >= self.batch_size or time.monotonic() - self.last_flush >= self.interval:
+			self.flush()
+
+	def flush(self):
+		if self.unsaved_changes > 0:
+			with file_lock.locked(self.path):
+				if os.path.isfile(self.path):
+					with open(self.path, "r", encoding="utf-8") as f:
+						for key, value in json.load(f).items():
+							self.data.setdefault(key, value)
+				write_json_atomic(self.path, self.data)
+			self.unsaved_changes = 0
+		self.last_flush = time.monotonic()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.flush()
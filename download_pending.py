@@ -2,7 +2,8 @@
 Downloads the pending translation from a pull request.
 """
 import os
-import requests
+import http_client
+import workspace
 import sys
 
 def download_pending(url):
@@ -19,7 +20,7 @@ def download_pending(url):
 
 	# Send GET request to get the file list
 	print(f"Downloading file list from {pr_files_url}...")
-	response = requests.get(pr_files_url, headers=headers)
+	response = http_client.get(pr_files_url, headers=headers)
 	response.raise_for_status()
 
 	# Get the json response content
@@ -29,15 +30,15 @@ def download_pending(url):
 	for file in files:
 		if (file['status'] == 'added' or file['status'] == 'modified') and file['filename'].endswith('.json'):
 			# Download the file
-			json_file_content = requests.get(file['raw_url'], headers=headers).text
+			json_file_content = http_client.get(file['raw_url'], headers=headers).text
 
 			# Get the language code from the filename and save it
 			langcode = file['filename'].split('/')[-1][:-5].lower()
-			with open(f"pending_lang.txt", 'w', encoding='utf-8') as f:
+			with open(workspace.get_path("pending_lang.txt"), 'w', encoding='utf-8') as f:
 				f.write(langcode)
 
 			# Write the file content to 'pending.json'
-			with open('pending.json', 'w', encoding='utf-8') as f:
+			with open(workspace.get_path('pending.json'), 'w', encoding='utf-8') as f:
 				f.write(json_file_content)
 			print(f"File {file['filename'].split('/')[-1]} has been saved as pending.json")
 			return
@@ -0,0 +1,70 @@
+"""
+Stores embeddings as one big float32 matrix on disk, plus a journal that maps each text hash to its row. The matrix is memory-mapped, so loading the store takes milliseconds no matter how many embeddings it holds, and each dimension only takes 4 bytes. Adding embeddings is locked, so several processes can share one store.
+"""
+import os
+import numpy as np
+import journal
+import file_lock
+
+class EmbeddingStore:
+	def __init__(self, path, dimensions):
+		self.vectors_path = f"{path}.f32"
+		self.index_path = f"{path}.index.jsonl"
+		self.dimensions = dimensions
+		self.row_size = dimensions * np.dtype(np.float32).itemsize
+		self.load_index()
+		self.map_vectors()
+
+	def load_index(self):
+		# ignore rows that weren't completely written, and index entries without a row
+		file_rows = os.path.getsize(self.vectors_path) // self.row_size if os.path.isfile(self.vectors_path) else 0
+		index, _ = journal.load(self.index_path)
+		self.index = {text_hash: row for text_hash, row in index.items() if row < file_rows}
+		# rows are indexed in order, so rows after the last indexed one were never indexed and the next add() overwrites them
+		self.rows = max(self.index.values()) + 1 if self.index else 0
+
+	def map_vectors(self):
+		if self.rows > 0:
+			self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.dimensions))
+		else:
+			self.vectors = np.empty((0, self.dimensions), dtype=np.float32)
+
+	def __contains__(self, text_hash):
+		return text_hash in self.index
+
+	def __len__(self):
+		return len(self.index)
+
+	def get(self, text_hash):
+		return self.vectors[self.index[text_hash]]
+
+	def get_matrix(self, text_hashes):
+		# returns the embeddings for the given hashes as one (len(text_hashes), dimensions) matrix
+		rows = np.fromiter((self.index[text_hash] for text_hash in text_hashes), dtype=np.int64, count=len(text_hashes))
+		return self.vectors[rows]
+
+	def add(self, items):
+		# items is a list of (text_hash, embedding) pairs
+		with file_lock.locked(self.vectors_path):
+			# pick up rows that other processes have added since the store was loaded
+			self.load_index()
+			items = [(text_hash, embedding) for text_hash, embedding in items if text_hash not in self.index]
+			if not items:
+				self.map_vectors()
+				return
+			matrix = np.asarray([embedding for _, embedding in items], dtype=np.float32)
+			if matrix.shape[1] != self.dimensions:
+				raise ValueError(f"Expected {self.dimensions}-dimensional embeddings, got {matrix.shape[1]}")
+
+			# release the old mapping, then append the vectors before indexing them,
+			# so that a crash can never leave an index entry pointing at a missing row
+			self.vectors = None
+			with open(self.vectors_path, "ab") as f:
+				f.truncate(self.rows * self.row_size)
+				f.write(matrix.tobytes())
+			with journal.open_for_append(self.index_path) as f:
+				for i, (text_hash, _) in enumerate(items):
+					self.index[text_hash] = self.rows + i
+					journal.append(f, text_hash, self.rows + i)
+			self.rows += len(items)
+			self.map_vectors()
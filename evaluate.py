@@ -4,13 +4,66 @@ This is what adds all the errors, warnings, etc. that you see in the table. More
 import datetime
 import json
 import os
-import re
-from langfiles import original, pending, old_translation
-from google_translate import forward, gt_identical, gt_reversible, gt_reversible_artifacts, gt_same_meaning
-from wiki_data import wiki_data
-from gpt_extract_mcnames import mcnames
-from gpt_embeddings import low_distance_any, get_low_distance_message
+import langfiles
+import google_translate
+import wiki_data
+import gpt_extract_mcnames
+import gpt_embeddings
+from gpt_embeddings import get_low_distance_message
+import rules
 import namefinder
+import aho_corasick
+import fingerprint
+import workspace
+
+# load everything that the evaluations depend on
+original = langfiles.get_original()
+pending = langfiles.get_pending()
+old_translation = langfiles.get_old_translation()
+forward = google_translate.get_forward()
+gt_identical = google_translate.get_comparison()["identical"]
+gt_reversible = google_translate.get_comparison()["reversible"]
+gt_reversible_artifacts = google_translate.get_comparison()["reversible_artifacts"]
+gt_same_meaning = google_translate.get_comparison()["same_meaning"]
+mcnames = gpt_extract_mcnames.get_mcnames()
+low_distance_any = gpt_embeddings.get_low_distance_any()
+
+# fingerprint everything that each key's evaluation depends on, including the checks themselves
+# the checks also depend on which names namefinder.py and aho_corasick.py find, so their code counts too
+check_sources = []
+for path in [__file__, rules.__file__, namefinder.__file__, aho_corasick.__file__]:
+	with open(path, encoding='utf-8') as f:
+		check_sources.append(f.read())
+with open('names.txt', encoding='utf-8') as f:
+	names_source = f.read()
+checks_fingerprint = fingerprint.get_fingerprint(check_sources, names_source, sorted(wiki_data.get_wiki_data().keys()), langfiles.get_langcode())
+def get_key_fingerprint(key):
+	return fingerprint.get_fingerprint(
+		checks_fingerprint,
+		original.get(key),
+		pending.get(key),
+		old_translation.get(key),
+		forward.get(key),
+		[key in gt_identical, key in gt_reversible, key in gt_reversible_artifacts],
+		mcnames.get(key),
+		get_low_distance_message(key) if key in low_distance_any else None,
+	)
+all_keys = list(dict.fromkeys([*original.keys(), *pending.keys()]))
+fingerprints = {key: get_key_fingerprint(key) for key in all_keys}
+
+# load the results of the last run, so only keys whose fingerprint has changed need to be checked again
+cached_evals = {}
+cached_fingerprints = {}
+if os.path.isfile(workspace.get_path('cache/evals.json')) and os.path.isfile(workspace.get_path('cache/evals_fingerprints.json')):
+	with open(workspace.get_path('cache/evals.json'), encoding='utf-8') as f:
+		cached_evals = json.load(f)
+	with open(workspace.get_path('cache/evals_fingerprints.json'), encoding='utf-8') as f:
+		cached_fingerprints = json.load(f)
+changed_keys = {key for key in all_keys if cached_fingerprints.get(key) != fingerprints[key]}
+changed_original_keys = [key for key in original.keys() if key in changed_keys]
+changed_pending_keys = [key for key in pending.keys() if key in changed_keys]
+if len(changed_keys) < len(all_keys):
+	print(f"Reusing evaluations for {len(all_keys) - len(changed_keys)} out of {len(all_keys)} strings.")
 
 # define evals and helper functions
 evals = {}
@@ -42,8 +95,13 @@ def add_good_sign(key, message):
 # add timestamp
 add_info("_general_", f"This analysis was generated on {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}.")
 
+# reuse the results for unchanged keys
+for key in all_keys:
+	if key not in changed_keys and key in cached_evals:
+		evals[key] = cached_evals[key]
+
 # check for untranslated strings
-for key in original.keys():
+for key in changed_original_keys:
 	if key not in pending:
 		if key in old_translation:
 			add_info(key, "Skipped this string because it's identical to the old translation.")
@@ -55,8 +113,9 @@ for key in original.keys():
 
 # check for strings that don't exist in the original
 new_strings = pending.keys() - original.keys()
-for key in new_strings:
-	add_error(key, "This string does not exist in the original.")
+for key in changed_pending_keys:
+	if key in new_strings:
+		add_error(key, "This string does not exist in the original.")
 if len(new_strings) > 0:
 	add_error("_general_", f"The translation contains {len(new_strings)} strings that don't exist in the original.")
 
@@ -77,7 +136,7 @@ for key in pending.keys():
 add_info("_general_", f"Original has {original_word_count} words, pending has {pending_word_count} words.")
 
 # check Google Translate results
-for key in gt_same_meaning:
+for key in changed_pending_keys:
 	if key in gt_identical:
 		add_info(key, "This translation is identical to Google Translate.")
 	elif key in gt_reversible:
@@ -94,75 +153,19 @@ add_info("_general_", f"{len(gt_same_meaning)} out of {len(pending)} translation
 
 # check embeddings
 low_distance_adjusted = low_distance_any - gt_same_meaning
-for key in low_distance_adjusted:
+for key in changed_pending_keys:
+	if key not in low_distance_adjusted:
+		continue
 	add_good_sign(key, get_low_distance_message(key))
 add_info("_general_", f"{len(low_distance_adjusted)} out of {len(pending)} translations ({len(low_distance_adjusted) / len(pending) * 100:.2f}%) have a low embedding distance.")
 
-# check extracted Minecraft names
-for key in pending.keys():
-	if key not in mcnames.keys():
-		continue
-	for name in mcnames[key]:
-		translation = name["translation"]
-		original_singular = name["original_singular"]
-		translation_key = name["translation_key"]
-		official_translation = name["official_translation"]
-		if translation.lower() not in pending[key].lower():
-			# if the translation isn't actually in pending, just add an info with the official translation
-			add_info(key, f"Minecraft translates \"{original_singular}\" ({translation_key}) as \"{official_translation}\".")
-		elif translation.lower() == official_translation.lower():
-			add_good_sign(key, f"Minecraft translates \"{original_singular}\" ({translation_key}) as \"{official_translation}\", which is consistent with this translation.")
-		else:
-			add_warning(key, f"Possible inconsistency: Minecraft translates \"{original_singular}\" ({translation_key}) as \"{official_translation}\", but this translation says \"{translation}\" instead.")
-
-# check for miscapitalized names
-for name in wiki_data.keys():
-	pattern = re.compile(name, re.IGNORECASE)
-	for key in pending.keys():
-		for match in re.finditer(pattern, pending[key]):
-			# ignore .commands
-			if match.start() > 0 and pending[key][match.start() - 1] == ".":
-				continue
-			# ignore .help commands
-			if match.start() > 6 and pending[key][match.start() - 6:match.start()] == ".help ":
-				continue
-			# ignore correctly capitalized names
-			if match.group() == name:
-				continue
-			add_error(key, f"Miscapitalized feature name: {match.group()} (should be {name})")
-
-# compare formatting codes
-for key in pending.keys():
-	original_codes = re.findall(r"§[0-9a-fk-or]|%[sdf]", original.get(key, ""))
-	pending_codes = re.findall(r"§[0-9a-fk-or]|%[sdf]", pending[key])
-	if original_codes != pending_codes:
-		add_warning(key, f"Formatting codes have changed: {''.join(original_codes)} -> {''.join(pending_codes)}")
-
-# compare line breaks
-for key in pending.keys():
-	original_lines = re.findall(r"\n", original.get(key, ""))
-	pending_lines = re.findall(r"\n", pending[key])
-	if original_lines != pending_lines:
-		add_warning(key, "Line breaks have changed.")
-
-# check for deleted/changed names
-for key in pending.keys():
-	original_names = set(namefinder.get_names(original.get(key, "")))
-	pending_names = set(namefinder.get_names(pending[key]))
-	missing_names = original_names - pending_names
-	for name in missing_names:
-		add_warning(key, f"Name \"{name}\" is present in the original but not in the translation.")
-
-# check for untranslated colors
-color_pattern = re.compile(r"§[0-9a-fk-or](black|dark blue|dark green|dark aqua|dark red|dark purple|gold|gray|dark gray|blue|green|aqua|red|light purple|yellow|white|orange)§r")
-for key in pending.keys():
-	# check if original has any colors
-	if color_pattern.search(original.get(key, "")) is None:
-		continue
-	# check if pending has any colors
-	matches = color_pattern.finditer(pending[key])
-	for match in matches:
-		add_error(key, f"The color \"{match.group(1)}\" was not translated.")
+# run the per-string checks on the changed keys, see rules.py
+rules.init(original, pending, mcnames, list(wiki_data.get_wiki_data().keys()))
+for key, evaluation in rules.evaluate_keys_in_parallel(changed_pending_keys).items():
+	for category, messages in evaluation.items():
+		evals.setdefault(key, {}).setdefault(category, []).extend(messages)
+rules.stop_workers()
+rules.print_times()
 
 # add info about the number of errors and warnings
 error_count = 0
@@ -179,7 +182,9 @@ add_info("_general_", f"{error_count} errors and {warning_count} warnings were f
 add_info("_general_", f"{no_issues_count} out of {len(pending)} strings ({no_issues_count / len(pending) * 100:.2f}%) have no issues.")
 
 # save the results
-if not os.path.exists('cache'):
-	os.makedirs('cache')
-with open('cache/evals.json', 'w', encoding='utf-8') as f:
+if not os.path.exists(workspace.get_path('cache')):
+	os.makedirs(workspace.get_path('cache'))
+with open(workspace.get_path('cache/evals.json'), 'w', encoding='utf-8') as f:
 	json.dump(evals, f, indent=2)
+with open(workspace.get_path('cache/evals_fingerprints.json'), 'w', encoding='utf-8') as f:
+	json.dump(fingerprints, f, indent=2)
@@ -0,0 +1,34 @@
+"""
+A lock that works across processes, using a lock file next to the file it protects. batch_make_tables.py runs several analyses at once, and they all write to the same shared caches.
+"""
+import contextlib
+import os
+
+if os.name == "nt":
+	import msvcrt
+else:
+	import fcntl
+
+@contextlib.contextmanager
+def locked(path):
+	# blocks until no other process (or thread) holds the lock for path
+	with open(f"{path}.lock", "a+b") as f:
+		if os.name == "nt":
+			f.seek(0)
+			while True:
+				# msvcrt.LK_LOCK only retries for 10 seconds, so keep trying
+				try:
+					msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+					break
+				except OSError:
+					continue
+		else:
+			fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+		try:
+			yield
+		finally:
+			if os.name == "nt":
+				f.seek(0)
+				msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+			else:
+				fcntl.flock(f.fileno(), fcntl.LOCK_UN)
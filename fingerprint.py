@@ -0,0 +1,9 @@
+"""
+Fingerprints of a stage's inputs for one key, so that a stage can tell which keys changed since its results were cached and only recompute those.
+"""
+import hashlib
+import json
+
+def get_fingerprint(*inputs):
+	# inputs can be anything that JSON can represent, sets need to be converted to sorted lists first
+	return hashlib.sha256(json.dumps(inputs, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
@@ -1,37 +1,107 @@
 """
-Does the forward and reverse translations using Google Translate. Only reverse is shown in the table, but all three are used for evaluations.
+Does the forward and reverse translations using Google Translate. Only reverse is shown in the table, but all three are used for evaluations. Each translation pass only runs the first time its result is needed.
 """
-import json
 import os
+import hashlib
+import threading
+import concurrent.futures
+import journal
+import rate_limit
 from tqdm import tqdm
 from googletrans import Translator, LANGUAGES
-from langfiles import original, pending, langcode_short
+import langfiles
 
-translator = Translator()
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 10
+MAX_RETRIES = 5
 
-# Create the cache directory if it doesn't exist
-if not os.path.exists('cache/google_translate'):
-	os.makedirs('cache/google_translate')
+rate_limiter = rate_limit.TokenBucket(REQUESTS_PER_SECOND, MAX_WORKERS)
+thread_local = threading.local()
+# the translation passes share one rate limit, so running them one at a time doesn't cost anything and keeps the cache journal to a single writer
+translate_lock = threading.Lock()
+
+CACHE_PATH = 'cache/google_translate/translations.jsonl'
+cache = None
+# whether the last pass that wrote to the cache finished, see journal.load()
+cache_complete = True
+cache_lock = threading.Lock()
+
+def get_cache():
+	global cache, cache_complete
+	with cache_lock:
+		if cache is None:
+			# Create the cache directory if it doesn't exist
+			if not os.path.exists('cache/google_translate'):
+				os.makedirs('cache/google_translate', exist_ok=True)
+
+			# load all previous translations, no matter which language or langfile they came from
+			cache, cache_complete = journal.load(CACHE_PATH)
+	return cache
+
+def get_cache_key(text, src, dest):
+	return hashlib.sha256(f"{src}\n{dest}\n{text}".encode("utf-8")).hexdigest()
+
+def get_translator():
+	# googletrans clients aren't thread-safe, so each worker thread gets its own
+	if not hasattr(thread_local, "translator"):
+		# raise on errors instead of silently returning the untranslated text
+		thread_local.translator = Translator(raise_exception=True)
+	return thread_local.translator
+
+def translate_text(text, src, dest):
+	for retry in range(MAX_RETRIES + 1):
+		rate_limiter.acquire()
+		try:
+			return get_translator().translate(text, src=src, dest=dest).text
+		except Exception as e:
+			# back off on "429 Too Many Requests", give up on anything else
+			if '"429"' not in str(e) or retry == MAX_RETRIES:
+				raise
+			tqdm.write(f"Rate limited by Google Translate, pausing for {2**retry}s...")
+			rate_limiter.pause(2**retry)
+
+def translate_all(items, src, dest, message):
+	with translate_lock:
+		return translate_all_unlocked(items, src, dest, message)
+
+def translate_all_unlocked(items, src, dest, message):
+	global cache_complete
+	# only send texts that haven't been translated before, and each of them only once
+	cache = get_cache()
+	cache_keys = [get_cache_key(text, src, dest) for _, text in items]
+	missing = {}
+	for cache_key, (_, text) in zip(cache_keys, items):
+		if cache_key not in cache:
+			missing[cache_key] = text
+
+	if missing:
+		print(message)
+		if cache and not cache_complete:
+			print(f"Resuming an interrupted run, {len(cache)} translations were already saved.")
+		with journal.open_for_append(CACHE_PATH) as f, concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+			future_to_cache_key = {executor.submit(translate_text, text, src, dest): cache_key for cache_key, text in missing.items()}
+			try:
+				for future in tqdm(concurrent.futures.as_completed(future_to_cache_key), total=len(future_to_cache_key)):
+					cache_key = future_to_cache_key[future]
+					cache[cache_key] = future.result()
+					journal.append(f, cache_key, cache[cache_key])
+			except BaseException:
+				# don't keep translating in the background after a failure or Ctrl+C
+				executor.shutdown(wait=False, cancel_futures=True)
+				raise
+			journal.mark_complete(f)
+			cache_complete = True
+	return {key: cache[cache_key] for (key, _), cache_key in zip(items, cache_keys)}
 
 def forward_translate(lang):
 	langname = LANGUAGES.get(lang).capitalize()
-	print(f"Google-translating en_us.json to {langname}...")
-	translations = {}
-	for key, value in tqdm(original.items()):
-		translations[key] = translator.translate(value, src='en', dest=lang).text
-		with open('cache/google_translate/forward.json', 'w', encoding='utf-8') as f:
-			json.dump(translations, f, indent=2)
-	return translations
+	message = f"Google-translating en_us.json to {langname}..."
+	return translate_all(list(langfiles.get_original().items()), 'en', lang, message)
 
 def reverse_translate_pending(lang):
 	langname = LANGUAGES.get(lang).capitalize()
-	print(f"Revere-translating pending.json from {langname}...")
-	translations = {}
-	for key, value in tqdm(pending.items()):
-		translations[key] = translator.translate(value, src=lang, dest='en').text
-		with open('cache/google_translate/reverse.json', 'w', encoding='utf-8') as f:
-			json.dump(translations, f, indent=2)
-	return translations
+	message = f"Revere-translating pending.json from {langname}..."
+	return translate_all(list(langfiles.get_pending().items()), lang, 'en', message)
 
 """
 Translates the Google-translated original strings back to English to
@@ -41,64 +111,68 @@ Translate artifacts.
 """
 def reverse_translate_forward(forward, lang):
 	langname = LANGUAGES.get(lang).capitalize()
-	print(f"Revere-translating forward.json from {langname}...")
-	translations = {}
-	for key, value in tqdm(forward.items()):
-		translations[key] = translator.translate(value, src=lang, dest='en').text
-		with open('cache/google_translate/forward_reverse.json', 'w', encoding='utf-8') as f:
-			json.dump(translations, f, indent=2)
-	return translations
-
-original_mtime = os.path.getmtime('cache/lang/wurst/en_us.json')
-pending_mtime = os.path.getmtime('pending.json')
-
-# check if forward.json exists
-if not os.path.isfile('cache/google_translate/forward.json'):
-	forward = forward_translate(langcode_short)
-# check if forward.json is older than en_us.json
-elif os.path.getmtime('cache/google_translate/forward.json') < original_mtime:
-	forward = forward_translate(langcode_short)
-# load forward.json as dict
-else:
-	with open('cache/google_translate/forward.json', encoding='utf-8') as f:
-		forward = json.load(f)
-
-# check if reverse.json exists
-if not os.path.isfile('cache/google_translate/reverse.json'):
-	reversed = reverse_translate_pending(langcode_short)
-# check if reverse.json is older than pending.json
-elif os.path.getmtime('cache/google_translate/reverse.json') < pending_mtime:
-	reversed = reverse_translate_pending(langcode_short)
-# load reverse.json as dict
-else:
-	with open('cache/google_translate/reverse.json', encoding='utf-8') as f:
-		reversed = json.load(f)
-
-# check if forward_reverse.json exists
-if not os.path.isfile('cache/google_translate/forward_reverse.json'):
-	forward_reverse = reverse_translate_forward(forward, langcode_short)
-# check if forward_reverse.json is older than forward.json
-elif os.path.getmtime('cache/google_translate/forward_reverse.json') < os.path.getmtime('cache/google_translate/forward.json'):
-	forward_reverse = reverse_translate_forward(forward, langcode_short)
-# load forward_reverse.json as dict
-else:
-	with open('cache/google_translate/forward_reverse.json', encoding='utf-8') as f:
-		forward_reverse = json.load(f)
-
-del original_mtime, pending_mtime
-
-gt_identical = set()
-gt_reversible = set()
-gt_reversible_artifacts = set()
-
-for key in original.keys():
-	if key not in pending:
-		continue
-	if pending[key].lower() == forward[key].lower():
-		gt_identical.add(key)
-	if original[key].lower() == reversed[key].lower():
-		gt_reversible.add(key)
-	if reversed[key].lower() == forward_reverse[key].lower():
-		gt_reversible_artifacts.add(key)
-
-gt_same_meaning = gt_identical | gt_reversible | gt_reversible_artifacts
+	message = f"Revere-translating forward.json from {langname}..."
+	return translate_all(list(forward.items()), lang, 'en', message)
+
+forward = None
+forward_lock = threading.Lock()
+reversed = None
+reversed_lock = threading.Lock()
+forward_reverse = None
+forward_reverse_lock = threading.Lock()
+comparison = None
+comparison_lock = threading.Lock()
+
+def get_forward():
+	global forward
+	with forward_lock:
+		if forward is None:
+			forward = forward_translate(langfiles.get_langcode_short())
+	return forward
+
+def get_reversed():
+	global reversed
+	with reversed_lock:
+		if reversed is None:
+			reversed = reverse_translate_pending(langfiles.get_langcode_short())
+	return reversed
+
+def get_forward_reverse():
+	global forward_reverse
+	with forward_reverse_lock:
+		if forward_reverse is None:
+			forward_reverse = reverse_translate_forward(get_forward(), langfiles.get_langcode_short())
+	return forward_reverse
+
+def get_comparison():
+	# sets of keys where the translation matches Google Translate in some way
+	global comparison
+	with comparison_lock:
+		if comparison is None:
+			original = langfiles.get_original()
+			pending = langfiles.get_pending()
+			forward = get_forward()
+			reversed = get_reversed()
+			forward_reverse = get_forward_reverse()
+
+			gt_identical = set()
+			gt_reversible = set()
+			gt_reversible_artifacts = set()
+
+			for key in original.keys():
+				if key not in pending:
+					continue
+				if pending[key].lower() == forward[key].lower():
+					gt_identical.add(key)
+				if original[key].lower() == reversed[key].lower():
+					gt_reversible.add(key)
+				if reversed[key].lower() == forward_reverse[key].lower():
+					gt_reversible_artifacts.add(key)
+
+			comparison = {
+				"identical": gt_identical,
+				"reversible": gt_reversible,
+				"reversible_artifacts": gt_reversible_artifacts,
+				"same_meaning": gt_identical | gt_reversible | gt_reversible_artifacts,
+			}
+	return comparison
@@ -1,121 +1,206 @@
 import os
 import json
-import requests
+import time
+import hashlib
+import threading
+import http_client
+import concurrent.futures
+import numpy as np
+import openai_scheduler
+import embedding_store
 from tqdm import tqdm
-from langfiles import original, pending
-from google_translate import forward, reversed, forward_reverse
+import langfiles
+import google_translate
 from dotenv import load_dotenv
 
 load_dotenv()
-embeddings = {}
+MODEL = "text-embedding-ada-002"
+DIMENSIONS = 1536
 TIMEOUT = 300
 
+# limits for splitting texts into requests, see openai_scheduler.py for how many are sent at once
+MAX_CHUNK_TOKENS = 50000
+MAX_CHUNK_SIZE = 1000
+MAX_RETRIES = 3
+
+# older versions cached embeddings by translation key and type, made from these files
+LEGACY_CACHE_PATH = "cache/chatgpt/embeddings.json"
+LEGACY_TEXT_PATHS = {
+	"original": "cache/lang/wurst/en_us.json",
+	"pending": "pending.json",
+	"forward": "cache/google_translate/forward.json",
+	"reversed": "cache/google_translate/reverse.json",
+	"forward_reverse": "cache/google_translate/forward_reverse.json",
+}
+
+store = None
+store_lock = threading.Lock()
+
+def migrate_legacy_cache(store):
+	# the texts of the old embeddings can only be recovered from files that haven't changed since the embeddings were made
+	print("Migrating embeddings.json to the binary embedding store...")
+	with open(LEGACY_CACHE_PATH, encoding="utf-8") as f:
+		old_cache = json.load(f)
+	cache_mtime = os.path.getmtime(LEGACY_CACHE_PATH)
+	items = {}
+	for embedding_type, path in LEGACY_TEXT_PATHS.items():
+		if not os.path.isfile(path) or os.path.getmtime(path) > cache_mtime:
+			continue
+		with open(path, encoding="utf-8") as f:
+			texts = json.load(f)
+		for key, text in texts.items():
+			embedding = old_cache.get(key, {}).get(embedding_type)
+			if embedding is not None:
+				items[get_text_hash(text)] = embedding
+	store.add(list(items.items()))
+	print(f"Migrated {len(items)} embeddings.")
+	del old_cache
+	os.remove(LEGACY_CACHE_PATH)
+
+def get_store():
+	global store
+	with store_lock:
+		if store is None:
+			# embeddings are cached by model and text, so they can be shared between all languages and PRs
+			if not os.path.exists('cache/chatgpt'):
+				os.makedirs('cache/chatgpt', exist_ok=True)
+			store = embedding_store.EmbeddingStore(f"cache/chatgpt/embeddings_{MODEL}", DIMENSIONS)
+
+			# one-time migration from the cache of older versions
+			if os.path.isfile(LEGACY_CACHE_PATH):
+				migrate_legacy_cache(store)
+	return store
+
+def get_text_hash(text):
+	return hashlib.sha256(f"{MODEL}\n{text}".encode("utf-8")).hexdigest()
+
 def create_embedding_batch(texts):
-	tqdm.write(f"Requesting embeddings for {len(texts)} texts...")
 	headers = {
 		"Content-Type": "application/json",
 		"Authorization": f"Bearer {os.environ['OPENAI_API_KEY']}"
 	}
 	payload = {
 		"input": texts,
-		"model": "text-embedding-ada-002"
+		"model": MODEL
 	}
-	response = requests.post("https://api.openai.com/v1/embeddings", headers=headers, json=payload, timeout=TIMEOUT)
+	response = http_client.post("https://api.openai.com/v1/embeddings", headers=headers, json=payload, timeout=TIMEOUT)
+	openai_scheduler.scheduler.record_response(response)
 	response.raise_for_status()
-	return response.json()["data"]
-
-def create_all_embeddings():
-	global embeddings
-
-	# embed original texts
-	texts = [text for text in original.values()]
-	embs = create_embedding_batch(texts)
-	for i, key in enumerate(original):
-		embedding = embs[i]["embedding"]
-		if key not in embeddings:
-			embeddings[key] = {}
-		embeddings[key]["original"] = embedding
-
-	# embed pending texts
-	texts = [text for text in pending.values()]
-	embs = create_embedding_batch(texts)
-	for i, key in enumerate(pending):
-		embedding = embs[i]["embedding"]
-		if key not in embeddings:
-			embeddings[key] = {}
-		embeddings[key]["pending"] = embedding
-
-	# embed forward texts
-	texts = [text for text in forward.values()]
-	embs = create_embedding_batch(texts)
-	for i, key in enumerate(forward):
-		embedding = embs[i]["embedding"]
-		if key not in embeddings:
-			embeddings[key] = {}
-		embeddings[key]["forward"] = embedding
-
-	# embed reversed texts
-	texts = [text for text in reversed.values()]
-	embs = create_embedding_batch(texts)
-	for i, key in enumerate(reversed):
-		embedding = embs[i]["embedding"]
-		if key not in embeddings:
-			embeddings[key] = {}
-		embeddings[key]["reversed"] = embedding
-
-	# embed forward-reversed texts
-	texts = [text for text in forward_reverse.values()]
-	embs = create_embedding_batch(texts)
-	for i, key in enumerate(forward_reverse):
-		embedding = embs[i]["embedding"]
-		if key not in embeddings:
-			embeddings[key] = {}
-		embeddings[key]["forward_reverse"] = embedding
-
-# check if embeddings.json exists
-if os.path.exists("cache/chatgpt/embeddings.json"):
-	print("Loading embeddings from cache...")
-	with open("cache/chatgpt/embeddings.json", "r", encoding="utf-8") as f:
-		embeddings = json.load(f)
-else:
-	print("Creating embeddings...")
-	create_all_embeddings()
-	with open("cache/chatgpt/embeddings.json", "w", encoding="utf-8") as f:
-		json.dump(embeddings, f, indent=2)
-
-def get_distance(key, type1, type2):
-	return sum((a - b) ** 2 for a, b in zip(embeddings[key][type1], embeddings[key][type2])) ** 0.5
+	# put the embeddings in the same order as the texts
+	return [emb["embedding"] for emb in sorted(response.json()["data"], key=lambda emb: emb["index"])]
+
+def estimate_tokens(text):
+	# rough upper bound without a tokenizer: ~4 bytes per token for English, 3 for CJK
+	return len(text.encode("utf-8")) // 3 + 1
+
+def split_into_chunks(texts):
+	chunks = []
+	chunk = []
+	chunk_tokens = 0
+	for text in texts:
+		tokens = estimate_tokens(text)
+		if chunk and (len(chunk) >= MAX_CHUNK_SIZE or chunk_tokens + tokens > MAX_CHUNK_TOKENS):
+			chunks.append(chunk)
+			chunk = []
+			chunk_tokens = 0
+		chunk.append(text)
+		chunk_tokens += tokens
+	if chunk:
+		chunks.append(chunk)
+	return chunks
+
+def create_embeddings(texts):
+	# yields (texts, embeddings) for each chunk as soon as it's done, retrying failed chunks on their own
+	chunks = split_into_chunks(texts)
+	tqdm.write(f"Requesting embeddings for {len(texts)} texts in {len(chunks)} chunks...")
+	start_time = time.perf_counter()
+	pbar = tqdm(total=len(texts), desc="Embeddings", unit="text")
+	retries = [0] * len(chunks)
+	future_to_index = {openai_scheduler.scheduler.submit(create_embedding_batch, chunk): i for i, chunk in enumerate(chunks)}
+	while future_to_index:
+		done, _ = concurrent.futures.wait(future_to_index.keys(), return_when=concurrent.futures.FIRST_COMPLETED)
+		for future in done:
+			i = future_to_index.pop(future)
+			try:
+				embeddings = future.result()
+			except Exception as e:
+				retries[i] += 1
+				if retries[i] > MAX_RETRIES:
+					raise
+				tqdm.write(f"Retrying chunk {i + 1}/{len(chunks)} ({retries[i]}/{MAX_RETRIES}) after error: {e}")
+				new_future = openai_scheduler.scheduler.submit(create_embedding_batch, chunks[i], delay=retries[i]**2)
+				future_to_index[new_future] = i
+				continue
+			pbar.update(len(chunks[i]))
+			yield chunks[i], embeddings
+	pbar.close()
+	elapsed = time.perf_counter() - start_time
+	tqdm.write(f"Embedded {len(texts)} texts in {elapsed:.1f}s ({len(texts) / elapsed:.0f} texts/s).")
+
+def embed_texts(texts):
+	# only request embeddings for texts that haven't been embedded before
+	store = get_store()
+	missing = list(dict.fromkeys(text for text in texts if get_text_hash(text) not in store))
+	if not missing:
+		return
+	# save each chunk right away, so a failed chunk doesn't lose the others
+	for chunk, embeddings in create_embeddings(missing):
+		store.add([(get_text_hash(text), embedding) for text, embedding in zip(chunk, embeddings)])
+
+def get_matrix(texts, keys):
+	# returns the embeddings of the given keys' texts as one matrix, with one row per key
+	return get_store().get_matrix([get_text_hash(texts[key]) for key in keys])
+
+def get_distances(texts1, texts2, keys):
+	return np.linalg.norm(get_matrix(texts1, keys) - get_matrix(texts2, keys), axis=1)
 
 source_threshold = 0.185
 target_threshold = 0.197
 source_vs_gt_threshold = -0.043
 
-low_source_distance = {}
-low_target_distance = {}
-low_source_vs_gt_distance = {}
-low_distance_any = set()
-
-print("Calculating distances...")
-for key in embeddings:
-	if "original" not in embeddings[key] or "pending" not in embeddings[key]:
-		continue
-
-	source_distance = get_distance(key, "original", "reversed")
-	target_distance = get_distance(key, "forward", "pending")
-	source_gt_distance = get_distance(key, "original", "forward_reverse")
-	source_vs_gt_distance = source_distance - source_gt_distance
-
-	if source_distance <= source_threshold:
-		low_source_distance[key] = source_distance
-		low_distance_any.add(key)
-	if target_distance <= target_threshold:
-		low_target_distance[key] = target_distance
-		low_distance_any.add(key)
-	if source_vs_gt_distance <= source_vs_gt_threshold:
-		low_source_vs_gt_distance[key] = source_vs_gt_distance
-		low_distance_any.add(key)
+low_distances = None
+low_distances_lock = threading.Lock()
+
+def get_low_distances():
+	# returns the low source, target and source vs. GT distances, each as a dict of key -> distance
+	global low_distances
+	with low_distances_lock:
+		if low_distances is None:
+			original = langfiles.get_original()
+			pending = langfiles.get_pending()
+			forward = google_translate.get_forward()
+			reversed = google_translate.get_reversed()
+			forward_reverse = google_translate.get_forward_reverse()
+
+			print("Loading embeddings...")
+			embed_texts([text for texts in [original, pending, forward, reversed, forward_reverse] for text in texts.values()])
+
+			low_source_distance = {}
+			low_target_distance = {}
+			low_source_vs_gt_distance = {}
+
+			print("Calculating distances...")
+			# only keys that exist in both original and pending can be compared
+			keys = [key for key in original if key in pending]
+			source_distances = get_distances(original, reversed, keys)
+			target_distances = get_distances(forward, pending, keys)
+			source_vs_gt_distances = source_distances - get_distances(original, forward_reverse, keys)
+
+			for i in np.flatnonzero(source_distances <= source_threshold):
+				low_source_distance[keys[i]] = float(source_distances[i])
+			for i in np.flatnonzero(target_distances <= target_threshold):
+				low_target_distance[keys[i]] = float(target_distances[i])
+			for i in np.flatnonzero(source_vs_gt_distances <= source_vs_gt_threshold):
+				low_source_vs_gt_distance[keys[i]] = float(source_vs_gt_distances[i])
+			low_distances = (low_source_distance, low_target_distance, low_source_vs_gt_distance)
+	return low_distances
+
+def get_low_distance_any():
+	low_source_distance, low_target_distance, low_source_vs_gt_distance = get_low_distances()
+	return low_source_distance.keys() | low_target_distance.keys() | low_source_vs_gt_distance.keys()
 
 def get_low_distance_message(key):
+	low_source_distance, low_target_distance, low_source_vs_gt_distance = get_low_distances()
 	low_distances = []
 	if key in low_source_distance:
 		low_distances.append(f"src={low_source_distance[key]:.3f}")
@@ -3,21 +3,55 @@ Shows the original and pending strings to ChatGPT and asks it to extract the nam
 """
 import json
 import os
-import time
 import re
-import requests
+import threading
+import http_client
 import openai_cost
+import openai_scheduler
+import checkpoint
+import file_lock
+import fingerprint
 import concurrent.futures
 from tqdm import tqdm
-from langfiles import original, pending, langcode
+import langfiles
+import workspace
 import i18n
 
 model = "gpt-3.5-turbo-0125"
 # model = "gpt-4o-2024-05-13"
 seed = 1337
 MAX_RETRIES = 3
-MAX_WORKERS = 20
 TIMEOUT = 90
+# how many strings to analyze per request, 1 sends every string on its own
+BATCH_SIZE = 10
+# rough prompt token counts for estimating the cost, most of each request is the function schema
+SCHEMA_PROMPT_TOKENS = 150
+STRING_PROMPT_TOKENS = 51
+
+# results are cached by the fingerprint of each string's inputs, so a string is only analyzed again when its text changes
+CACHE_PATH = "cache/chatgpt/mcnames_by_fingerprint.json"
+# older versions cached results by translation key, made from these files
+LEGACY_CACHE_PATH = "cache/chatgpt/mcnames.json"
+LEGACY_ORIGINAL_PATH = "cache/lang/wurst/en_us.json"
+
+name_schema = {
+	"type": "object",
+	"properties": {
+		"original": {
+			"type": "string",
+			"description": "What the Minecraft thing is called in the original string."
+		},
+		"translation": {
+			"type": "string",
+			"description": "What the Minecraft thing is called in the translation string."
+		},
+		"original_singular": {
+			"type": "string",
+			"description": "Convert the original name to singular form. Return the original name if it's already singular."
+		}
+	},
+	"required": ["original", "translation", "original_singular"]
+}
 
 analyze_schema = {
 	"name": "analyze",
@@ -28,31 +62,44 @@ analyze_schema = {
 			"names": {
 				"type": "array",
 				"description": "List all the Minecraft things you see in the string.",
+				"items": name_schema
+			}
+		},
+		"required": ["names"]
+	}
+}
+
+analyze_batch_schema = {
+	"name": "analyze",
+	"description": "Extract names of Minecraft items, blocks, mobs, etc. from each of the given strings and their translations. Each string has an ID. Return exactly one item per ID, with an empty list of names if the string doesn't contain any. Keep in mind that many new things have been added to Minecraft since your knowledge cutoff date. If you see something that looks like a Minecraft thing but you don't recognize it, include it anyway.",
+	"parameters": {
+		"type": "object",
+		"properties": {
+			"items": {
+				"type": "array",
+				"description": "One item for each string.",
 				"items": {
 					"type": "object",
 					"properties": {
-						"original": {
-							"type": "string",
-							"description": "What the Minecraft thing is called in the original string."
+						"id": {
+							"type": "integer",
+							"description": "The ID of the string."
 						},
-						"translation": {
-							"type": "string",
-							"description": "What the Minecraft thing is called in the translation string."
-						},
-						"original_singular": {
-							"type": "string",
-							"description": "Convert the original name to singular form. Return the original name if it's already singular."
+						"names": {
+							"type": "array",
+							"description": "List all the Minecraft things you see in the string.",
+							"items": name_schema
 						}
 					},
-					"required": ["original", "translation", "original_singular"]
+					"required": ["id", "names"]
 				}
 			}
 		},
-		"required": ["names"]
+		"required": ["items"]
 	}
 }
 
-def request_completion(messages):
+def request_completion(messages, schema):
 	headers = {
 		"Content-Type": "application/json",
 		"Authorization": f"Bearer {os.environ['OPENAI_API_KEY']}"
@@ -61,129 +108,283 @@ def request_completion(messages):
 		"model": model,
 		"seed": seed,
 		"messages": messages,
-		"functions": [analyze_schema],
+		"functions": [schema],
 		"function_call": {"name": "analyze"},
 	}
-	response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload, timeout=TIMEOUT)
+	response = http_client.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload, timeout=TIMEOUT)
+	openai_scheduler.scheduler.record_response(response)
 	response.raise_for_status()
 	return response.json()
 
-def analyze_mcnames():
-	global mcnames
-	usages = []
-	if not os.path.exists('cache/chatgpt'):
-		os.makedirs('cache/chatgpt')
+def request_analysis(pairs):
+	# single strings use the original prompt, batches label each string with an ID
+	if len(pairs) == 1:
+		original_value, pending_value = pairs[0]
+		user_message = f"Original:\n```\n{original_value}\n```\n\nTranslation:\n```\n{pending_value}\n```"
+		schema = analyze_schema
+	else:
+		user_message = "\n\n".join(
+			f"ID: {i}\nOriginal:\n```\n{original_value}\n```\nTranslation:\n```\n{pending_value}\n```"
+			for i, (original_value, pending_value) in enumerate(pairs, 1)
+		)
+		schema = analyze_batch_schema
+	return request_completion([{"role": "user", "content": user_message}], schema)
+
+def is_valid_names(names):
+	# clean_mcnames() needs a list of dicts with at least the original and translated name as strings
+	if not isinstance(names, list):
+		return False
+	for name in names:
+		if not isinstance(name, dict) or not isinstance(name.get("original"), str) or not isinstance(name.get("translation"), str):
+			return False
+		if not isinstance(name.get("original_singular", ""), (str, type(None))):
+			return False
+	return True
+
+def parse_analysis(keys, result):
+	# returns the names for each key that the response has a valid result for
+	arguments = json.loads(result["choices"][0]["message"]["function_call"]["arguments"])
+	if len(keys) == 1:
+		if not is_valid_names(arguments.get("names")):
+			raise ValueError("Malformed names in response")
+		return {keys[0]: arguments["names"]}
+	names = {}
+	for item in arguments.get("items", []):
+		# skip malformed items, their strings get requested on their own
+		if not isinstance(item, dict) or not is_valid_names(item.get("names")):
+			continue
+		try:
+			index = int(item.get("id")) - 1
+		except (TypeError, ValueError):
+			continue
+		if 0 <= index < len(keys) and keys[index] not in names:
+			names[keys[index]] = item["names"]
+	return names
 
-	# prepare the chats
+def get_chat(original_text, pending_text):
+	# surround all § codes with square brackets to improve tokenization
+	return tuple(re.sub(r'§.', lambda m: f"[{m.group(0)}]", text) for text in (original_text, pending_text))
+
+def get_chats():
+	# returns the original and pending value that would be sent for each key, along with its fingerprint
+	original = langfiles.get_original()
+	pending = langfiles.get_pending()
+	langcode = langfiles.get_langcode()
 	chats = {}
-	print("Preparing chats...")
+	fingerprints = {}
 	for key in pending.keys():
-		if key in mcnames or key not in original:
+		if key not in original:
 			continue
-		# surround all § codes with square brackets to improve tokenization
-		original_value = re.sub(r'§.', lambda m: f"[{m.group(0)}]", original[key])
-		pending_value = re.sub(r'§.', lambda m: f"[{m.group(0)}]", pending[key])
+		original_value, pending_value = get_chat(original[key], pending[key])
 		# skip untranslated strings
 		if original_value == pending_value:
 			continue
-		user_message = f"Original:\n```\n{original_value}\n```\n\nTranslation:\n```\n{pending_value}\n```"
-		messages = [{"role": "user", "content": user_message}]
-		chats[key] = messages
+		chats[key] = (original_value, pending_value)
+		fingerprints[key] = fingerprint.get_fingerprint(model, langcode, original_value, pending_value)
+	return chats, fingerprints
+
+def migrate_legacy_cache():
+	# the inputs of the old results can only be recovered from files that haven't changed since the results were made
+	print("Migrating mcnames.json to the fingerprint cache...")
+	with open(LEGACY_CACHE_PATH, encoding="utf-8") as f:
+		old_cache = json.load(f)
+	cache_mtime = os.path.getmtime(LEGACY_CACHE_PATH)
+	paths = [LEGACY_ORIGINAL_PATH, workspace.get_path("pending.json"), workspace.get_path("pending_lang.txt")]
+	items = {}
+	if all(os.path.isfile(path) and os.path.getmtime(path) <= cache_mtime for path in paths):
+		with open(paths[0], encoding="utf-8") as f:
+			original = json.load(f)
+		with open(paths[1], encoding="utf-8") as f:
+			pending = json.load(f)
+		with open(paths[2], encoding="utf-8") as f:
+			langcode = f.read().strip()
+		for key, names in old_cache.items():
+			if key not in original or key not in pending or not is_valid_names(names):
+				continue
+			original_value, pending_value = get_chat(original[key], pending[key])
+			items[fingerprint.get_fingerprint(model, langcode, original_value, pending_value)] = names
+
+	# keep any results that are already in the new cache
+	cache = {}
+	if os.path.isfile(CACHE_PATH):
+		with open(CACHE_PATH, encoding="utf-8") as f:
+			cache = json.load(f)
+	for fingerprint_value, names in items.items():
+		cache.setdefault(fingerprint_value, names)
+	checkpoint.write_json_atomic(CACHE_PATH, cache)
+	print(f"Migrated {len(items)} results.")
+	os.remove(LEGACY_CACHE_PATH)
+
+def load_cache():
+	# one-time migration from the cache of older versions
+	if os.path.isfile(LEGACY_CACHE_PATH):
+		with file_lock.locked(CACHE_PATH):
+			# another process might have migrated it in the meantime
+			if os.path.isfile(LEGACY_CACHE_PATH):
+				migrate_legacy_cache()
+	if not os.path.isfile(CACHE_PATH):
+		return {}
+	with open(CACHE_PATH, encoding='utf-8') as f:
+		return json.load(f)
+
+def get_missing_keys(cache):
+	chats, fingerprints = get_chats()
+	return [key for key in chats if fingerprints[key] not in cache]
+
+def analyze_mcnames(cache):
+	usages = []
+	if not os.path.exists('cache/chatgpt'):
+		os.makedirs('cache/chatgpt', exist_ok=True)
+
+	# prepare the chats, skipping strings that haven't changed since they were last analyzed
+	print("Preparing chats...")
+	chats, fingerprints = get_chats()
+	chats = {key: chat for key, chat in chats.items() if fingerprints[key] not in cache}
+	chat_keys = list(chats.keys())
+	batches = [chat_keys[i:i + BATCH_SIZE] for i in range(0, len(chat_keys), BATCH_SIZE)]
 
 	# initialize the progress bar and dict to keep track of retries
-	pbar = tqdm(total=len(chats), desc="Requests", unit="request")
+	pbar = tqdm(total=len(chats), desc="Strings", unit="string")
 	retries = {key: 0 for key in chats.keys()}
 
 	tqdm.write("Requesting completions...")
-	with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-		future_to_key = {executor.submit(request_completion, data): key for key, data in chats.items()}
+	# save results in batches instead of rewriting mcnames.json after every request
+	with checkpoint.Checkpointer(CACHE_PATH, cache) as checkpointer:
+		def submit(keys, delay=0):
+			future = openai_scheduler.scheduler.submit(request_analysis, [chats[key] for key in keys], delay=delay)
+			future_to_keys[future] = keys
+
+		future_to_keys = {}
+		for keys in batches:
+			submit(keys)
 
-		while future_to_key:
+		while future_to_keys:
 			# wait for the next future to complete
 			done, _ = concurrent.futures.wait(
-				future_to_key.keys(),
+				future_to_keys.keys(),
 				return_when=concurrent.futures.FIRST_COMPLETED
 			)
 
 			for future in done:
-				key = future_to_key.pop(future)
+				keys = future_to_keys.pop(future)
 				try:
 					result = future.result()
-					pbar.update(1)
 					if "usage" in result:
 						usages.append(result["usage"])
-					if "choices" in result:
-						mcnames[key] = json.loads(result["choices"][0]["message"]["function_call"]["arguments"])["names"]
-						with open("cache/chatgpt/mcnames.json", "w", encoding='utf-8') as f:
-							json.dump(mcnames, f, indent=2)
+					results = parse_analysis(keys, result)
 				except Exception as e:
+					if len(keys) > 1:
+						# fall back to single requests if a batch fails or its response is malformed
+						tqdm.write(f"Splitting batch of {len(keys)} strings into single requests after error: {e}")
+						for key in keys:
+							submit([key])
+						continue
+					key = keys[0]
 					retries[key] += 1
 					if retries[key] < MAX_RETRIES:
 						# write the error message to the console
 						tqdm.write(f"Retrying request for {key} ({retries[key]}/{MAX_RETRIES}) after error: {e}")
-						time.sleep(retries[key]**3)
-						# resubmit the task to the executor
-						new_future = executor.submit(request_completion, chats[key])
-						future_to_key[new_future] = key
+						# resubmit the task after a delay, without holding up the other results
+						submit([key], delay=retries[key]**3)
 					else:
 						# write the error message to the console
 						tqdm.write(f"Failed request for {key} after {MAX_RETRIES} retries: {e}")
+					continue
+
+				for key, names in results.items():
+					cache[fingerprints[key]] = names
+					checkpointer.update()
+				pbar.update(len(results))
+
+				# request strings that are missing from a batch response on their own
+				missing_keys = [key for key in keys if key not in results]
+				if missing_keys:
+					tqdm.write(f"Batch response is missing {len(missing_keys)} of {len(keys)} strings, requesting them one by one...")
+					for key in missing_keys:
+						submit([key])
 
 		pbar.close()
 	openai_cost.print_usage(usages, model)
 
-cost_estimate = openai_cost.estimate(model, 201, 85, len(pending))
+def get_cost_estimate(count):
+	return openai_cost.estimate(model, SCHEMA_PROMPT_TOKENS / BATCH_SIZE + STRING_PROMPT_TOKENS, 85, count)
+
+def clean_mcnames(mcnames):
+	original = langfiles.get_original()
+	langcode = langfiles.get_langcode()
+	cleaned_mcnames = {}
+	for key in mcnames.keys():
+		for name in mcnames[key]:
+			# remove mcnames that don't contain "original" or "translation"
+			if "original" not in name or name["original"] is None or name["original"] == "":
+				continue
+			if "translation" not in name or name["translation"] is None or name["translation"] == "":
+				continue
+			# remove mcnames that aren't actually present in original
+			if name["original"].lower() not in original[key].lower():
+				continue
+			# get original_singular, or fallback to original
+			original_singular = name.get("original_singular", None)
+			if original_singular is None or original_singular == "":
+				original_singular = name["original"]
+			# remove mcnames that don't actually exist in Minecraft
+			trkey = i18n.reverse_lookup(original_singular, fallback=False)
+			if trkey is False:
+				continue
+			# remove mcnames with no official translation
+			official_translation = i18n.translate(trkey, langcode, False)
+			if official_translation is False:
+				continue
+			# fix mcnames that don't contain "original_singular"
+			if "original_singular" not in name:
+				name["original_singular"] = name["original"]
+			# add trkey and official_translation
+			name["translation_key"] = trkey
+			name["official_translation"] = official_translation
+			# add to cleaned_mcnames
+			if key not in cleaned_mcnames:
+				cleaned_mcnames[key] = []
+			cleaned_mcnames[key].append(name)
+	return cleaned_mcnames
+
+mcnames = None
+mcnames_lock = threading.Lock()
+confirmed = None
+confirmed_lock = threading.Lock()
+
+def confirm_analysis():
+	# asks whether to analyze the strings that have no cached results yet, only once
+	global confirmed
+	with confirmed_lock:
+		if confirmed is None:
+			confirmed = True
+			missing_keys = get_missing_keys(load_cache())
+			if missing_keys:
+				# ask user to confirm
+				confirm = input(f"{len(missing_keys)} strings have no mcnames analysis yet. Analyzing them with {model} will cost approximately ${get_cost_estimate(len(missing_keys))}. Continue? (Y/n) ")
+				confirmed = confirm.lower() != "n"
+	return confirmed
+
+def get_mcnames():
+	global mcnames
+	with mcnames_lock:
+		if mcnames is None:
+			cache = load_cache()
+			if get_missing_keys(cache) and confirm_analysis():
+				analyze_mcnames(cache)
+			_, fingerprints = get_chats()
+			raw_mcnames = {key: cache[fingerprints[key]] for key in fingerprints if fingerprints[key] in cache}
+			mcnames = clean_mcnames(raw_mcnames)
+	return mcnames
+
 if __name__ == "__main__":
 	# ask user to confirm
-	confirm = input(f"Analyzing {len(pending)} strings with {model} will cost approximately ${cost_estimate}. Continue? (Y/n) ")
+	chats, fingerprints = get_chats()
+	pending_count = len(chats)
+	confirm = input(f"Analyzing {pending_count} strings with {model} will cost approximately ${get_cost_estimate(pending_count)}. Continue? (Y/n) ")
 	if confirm.lower() != "n":
-		mcnames = {}
-		analyze_mcnames()
-else:
-	# check if mcnames.json exists
-	if os.path.isfile('cache/chatgpt/mcnames.json'):
-		with open('cache/chatgpt/mcnames.json', encoding='utf-8') as f:
-			mcnames = json.load(f)
-	else:
-		# ask user to confirm
-		confirm = input(f"No mcnames analysis found. Analyzing {len(pending)} strings with {model} will cost approximately ${cost_estimate}. Continue? (Y/n) ")
-		if confirm.lower() != "n":
-			mcnames = {}
-			analyze_mcnames()
-
-# clean up the data
-cleaned_mcnames = {}
-for key in mcnames.keys():
-	for name in mcnames[key]:
-		# remove mcnames that don't contain "original" or "translation"
-		if "original" not in name or name["original"] is None or name["original"] == "":
-			continue
-		if "translation" not in name or name["translation"] is None or name["translation"] == "":
-			continue
-		# remove mcnames that aren't actually present in original
-		if name["original"].lower() not in original[key].lower():
-			continue
-		# get original_singular, or fallback to original
-		original_singular = name.get("original_singular", None)
-		if original_singular is None or original_singular == "":
-			original_singular = name["original"]
-		# remove mcnames that don't actually exist in Minecraft
-		trkey = i18n.reverse_lookup(original_singular, fallback=False)
-		if trkey is False:
-			continue
-		# remove mcnames with no official translation
-		official_translation = i18n.translate(trkey, langcode, False)
-		if official_translation is False:
-			continue
-		# fix mcnames that don't contain "original_singular"
-		if "original_singular" not in name:
-			name["original_singular"] = name["original"]
-		# add trkey and official_translation
-		name["translation_key"] = trkey
-		name["official_translation"] = official_translation
-		# add to cleaned_mcnames
-		if key not in cleaned_mcnames:
-			cleaned_mcnames[key] = []
-		cleaned_mcnames[key].append(name)
-mcnames = cleaned_mcnames
-del cleaned_mcnames
+		# forget the cached results for these strings, but keep the ones for other strings
+		cache = load_cache()
+		for key in fingerprints:
+			cache.pop(fingerprints[key], None)
+		analyze_mcnames(cache)
@@ -0,0 +1,24 @@
+"""
+Writes HTML tables row by row, so that large tables never have to be held in memory. The markup is the same as what pandas' to_html() used to produce for the table.
+"""
+
+def write_table_start(f, columns):
+	f.write('<table border="1" class="dataframe">\n')
+	f.write('  <thead>\n')
+	f.write('    <tr style="text-align: center;">\n')
+	for column in columns:
+		f.write(f'      <th>{column}</th>\n')
+	f.write('    </tr>\n')
+	f.write('  </thead>\n')
+	f.write('  <tbody>\n')
+
+def write_table_row(f, values):
+	# values are written as-is, so they must already be escaped
+	f.write('    <tr>\n')
+	for value in values:
+		f.write(f'      <td>{value}</td>\n')
+	f.write('    </tr>\n')
+
+def write_table_end(f):
+	f.write('  </tbody>\n')
+	f.write('</table>')
@@ -0,0 +1,132 @@
+"""
+The HTTP client that all network requests go through. Keeps connections alive in a pool per host, asks for gzip, applies the same default timeout and retry policy everywhere, and counts requests and latency per host.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+TIMEOUT = 60
+POOL_SIZE = 20
+
+# retry connection errors and server errors, but not 429s, since those are handled by the rate limiters.
+# only idempotent methods are retried after a request was sent, since a POST to OpenAI gets billed each time.
+retry_policy = Retry(
+	total=3,
+	backoff_factor=0.5,
+	status_forcelist=[500, 502, 503, 504],
+	raise_on_status=False,
+)
+
+session = requests.Session()
+session.headers["Accept-Encoding"] = "gzip, deflate"
+adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry_policy)
+session.mount("https://", adapter)
+session.mount("http://", adapter)
+
+stats = {}
+stats_lock = threading.Lock()
+
+def request(method, url, **kwargs):
+	kwargs.setdefault("timeout", TIMEOUT)
+	start_time = time.perf_counter()
+	failed = False
+	try:
+		return session.request(method, url, **kwargs)
+	except requests.exceptions.RequestException:
+		failed = True
+		raise
+	finally:
+		elapsed = time.perf_counter() - start_time
+		host = urlparse(url).hostname
+		with stats_lock:
+			host_stats = stats.setdefault(host, {"requests": 0, "errors": 0, "seconds": 0.0})
+			host_stats["requests"] += 1
+			host_stats["errors"] += failed
+			host_stats["seconds"] += elapsed
+
+def get(url, **kwargs):
+	return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+	return request("POST", url, **kwargs)
+
+def print_stats():
+	for host, host_stats in sorted(stats.items()):
+		average = host_stats["seconds"] / host_stats["requests"]
+		print(f"{host}: {host_stats['requests']} requests, {host_stats['errors']} errors, {average * 1000:.0f}ms average latency")
+
+def get_cached(url, path, max_age=None, **kwargs):
+	"""
+	Downloads url to path, or reuses the copy that's already there. With max_age=None, an existing copy is used forever, which is right for URLs whose content never changes. Otherwise the copy is used as-is for max_age seconds and then revalidated with a conditional GET, which only costs a cheap 304 if nothing changed. Returns the content as bytes and the response (None if no request was made), or None as content if the file doesn't exist on the server.
+	"""
+	meta_path = f"{path}.meta.json"
+	meta = {}
+	if os.path.isfile(meta_path):
+		with open(meta_path, "r", encoding="utf-8") as f:
+			meta = json.load(f)
+	has_copy = os.path.isfile(path)
+	is_fresh = max_age is None or time.time() - meta.get("checked", 0) < max_age
+
+	# use the copy (or the remembered 404) without any request while it's fresh
+	if is_fresh and (has_copy or (max_age is not None and meta.get("missing"))):
+		return read_bytes(path) if has_copy else None, None
+
+	headers = kwargs.pop("headers", {})
+	if has_copy and "etag" in meta:
+		headers["If-None-Match"] = meta["etag"]
+	if has_copy and "last_modified" in meta:
+		headers["If-Modified-Since"] = meta["last_modified"]
+	try:
+		response = get(url, headers=headers, **kwargs)
+	except requests.exceptions.ConnectionError:
+		# keep working offline if there's an old copy
+		if has_copy:
+			return read_bytes(path), None
+		raise
+
+	if response.status_code == 304 and has_copy:
+		content = read_bytes(path)
+	elif response.status_code == 200:
+		content = response.content
+		directory = os.path.dirname(path)
+		if directory and not os.path.exists(directory):
+			os.makedirs(directory, exist_ok=True)
+		write_bytes_atomic(path, content)
+		meta = {key: response.headers[header] for key, header in [("etag", "ETag"), ("last_modified", "Last-Modified")] if header in response.headers}
+	elif response.status_code == 404:
+		content = None
+		meta = {"missing": True}
+		if has_copy:
+			# another thread may have removed it already
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+	else:
+		return (read_bytes(path) if has_copy else None), response
+
+	meta["checked"] = time.time()
+	write_bytes_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+	return content, response
+
+def read_bytes(path):
+	with open(path, "rb") as f:
+		return f.read()
+
+def write_bytes_atomic(path, content):
+	# write to a temporary file first, so a crash can't leave a partial file behind. Each call gets its own
+	# temporary file, since several threads and processes may download the same file at the same time
+	fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp")
+	try:
+		with os.fdopen(fd, "wb") as f:
+			f.write(content)
+		os.replace(temp_path, path)
+	except BaseException:
+		os.remove(temp_path)
+		raise
@@ -1,41 +1,70 @@
 """
 Provides functions for translating and reverse-translating strings using Minecraft's and Wurst's language files.
 """
+import json
+import os
 import langfile_downloader
 
 lang_data = {}
+reverse_index = {}
 
-def translate(key, language="en_us", fallback=None):
+def load_language(language):
 	# load language file if it hasn't been loaded yet
 	if not language in lang_data:
 		lang_data[language] = langfile_downloader.load_merged_langfile(language)
+	return lang_data[language]
+
+def get_reverse_index(language):
+	# load or build the index if it hasn't been loaded yet
+	if not language in reverse_index:
+		reverse_index[language] = load_reverse_index(language)
+	return reverse_index[language]
+
+def load_reverse_index(language):
+	data = load_language(language)
+	index_path = f"cache/lang/reverse/{language}.json"
+	mc_langfile_path = langfile_downloader.get_mc_langfile_path(language)
+	wurst_langfile_path = f"cache/lang/wurst/{language}.json"
+
+	# use the cached index unless it was built from a different mc language file or an older wurst language file
+	if os.path.isfile(index_path):
+		with open(index_path, "r", encoding="utf-8") as f:
+			cached = json.load(f)
+		wurst_unchanged = not os.path.isfile(wurst_langfile_path) or os.path.getmtime(index_path) >= os.path.getmtime(wurst_langfile_path)
+		if cached.get("mc_langfile") == mc_langfile_path and wurst_unchanged:
+			return cached["index"]
 
+	# map each casefolded value to all keys that have it, in langfile order
+	index = {}
+	for key, val in data.items():
+		index.setdefault(val.casefold(), []).append(key)
+
+	if not os.path.exists('cache/lang/reverse'):
+		os.makedirs('cache/lang/reverse', exist_ok=True)
+	# write to a temporary file first, so other processes never read a partial index
+	with open(f"{index_path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+		json.dump({"mc_langfile": mc_langfile_path, "index": index}, f, ensure_ascii=False)
+	os.replace(f"{index_path}.{os.getpid()}.tmp", index_path)
+	return index
+
+def translate(key, language="en_us", fallback=None):
 	# return translation or fallback
-	return lang_data[language].get(key, key if fallback is None else fallback)
+	return load_language(language).get(key, key if fallback is None else fallback)
 
 def reverse_lookup(value, language="en_us", fallback=None):
-	# load language file if it hasn't been loaded yet
-	if not language in lang_data:
-		lang_data[language] = langfile_downloader.load_merged_langfile(language)
-
 	# try to find a matching value
-	for key, val in lang_data[language].items():
-		if val.lower() == value.lower():
-			return key
+	keys = get_reverse_index(language).get(value.casefold())
+	if keys:
+		return keys[0]
 
 	# if no match is found, return fallback
 	return value if fallback is None else fallback
 
 def reverse_lookup_multi(value, language="en_us", fallback=None):
-	# load language file if it hasn't been loaded yet
-	if not language in lang_data:
-		lang_data[language] = langfile_downloader.load_merged_langfile(language)
-
 	# try to find matching values
-	keys = []
-	for key, val in lang_data[language].items():
-		if val.lower() == value.lower():
-			keys.append(key)
-	
+	keys = get_reverse_index(language).get(value.casefold())
+	if keys:
+		return list(keys)
+
 	# if no match is found, return fallback
-	return keys if fallback is None else fallback
+	return [] if fallback is None else fallback
@@ -0,0 +1,49 @@
+"""
+Append-only JSON Lines journals for caching results one at a time. Each result is written as a single line, so saving it costs the same no matter how many results came before, and an interrupted run can be resumed exactly where it stopped. A marker line records that a run has finished, so load() can tell a finished run from an interrupted one. Writes are locked, so several processes can append to the same journal.
+"""
+import json
+import os
+import file_lock
+
+def load(path):
+	# returns the journaled results and whether the last run that wrote to the journal finished
+	results = {}
+	complete = False
+	if not os.path.isfile(path):
+		return results, complete
+	with open(path, "r", encoding="utf-8") as f:
+		for line in f:
+			try:
+				record = json.loads(line)
+			except json.JSONDecodeError:
+				# the last line may be cut off if the run was interrupted
+				complete = False
+				break
+			if record.get("complete"):
+				complete = True
+			else:
+				results[record["key"]] = record["value"]
+				complete = False
+	return results, complete
+
+def open_for_append(path):
+	# drop a cut-off last line, so that new lines don't get appended to it
+	with file_lock.locked(path):
+		if os.path.isfile(path):
+			with open(path, "rb+") as f:
+				data = f.read()
+				if data and not data.endswith(b"\n"):
+					f.truncate(data.rfind(b"\n") + 1)
+	return open(path, "a", encoding="utf-8")
+
+def write_line(f, line):
+	# hold the lock until the line is flushed, so lines from different processes can't get mixed up
+	with file_lock.locked(f.name):
+		f.write(line + "\n")
+		f.flush()
+
+def append(f, key, value):
+	write_line(f, json.dumps({"key": key, "value": value}, ensure_ascii=False))
+
+def mark_complete(f):
+	write_line(f, json.dumps({"complete": True}))
@@ -1,21 +1,40 @@
 """
 Downloads language files from Mojang's servers, InventivetalentDev's GitHub repo, and the Wurst7 GitHub repo. Also provides a function to load a merged dict for any given language.
 """
-import requests
+import http_client
+import checkpoint
+import file_lock
+import hashlib
 import json
 import os
+import threading
+from urllib.parse import urlparse
+from tqdm import tqdm
+
+# how long (in seconds) to use cached files before checking if they have changed
+MANIFEST_MAX_AGE = 3600
+WURST_MAX_AGE = 3600
 
 manifest_data = None
+immutable_json = {}
+version_map_lock = threading.Lock()
 
 def get_manifest():
 	global manifest_data
 	if manifest_data is None:
-		# Fetch the version manifest
+		# Fetch the version manifest, or use the cached one if it's still fresh
 		manifest_url = "https://piston-meta.mojang.com/mc/game/version_manifest_v2.json"
-		manifest_response = requests.get(manifest_url)
-		manifest_data = json.loads(manifest_response.text)
+		manifest_content, _ = http_client.get_cached(manifest_url, "cache/mojang/version_manifest_v2.json", max_age=MANIFEST_MAX_AGE)
+		manifest_data = json.loads(manifest_content)
 	return manifest_data
 
+def get_immutable_json(url):
+	# version data and asset indexes have their hash in the URL, so they never need to be downloaded or parsed twice
+	if url not in immutable_json:
+		content, _ = http_client.get_cached(url, f"cache/mojang{urlparse(url).path}")
+		immutable_json[url] = json.loads(content)
+	return immutable_json[url]
+
 def get_latest_version():
 	manifest_data = get_manifest()
 	# Find the ID for the latest version
@@ -27,72 +46,136 @@ def get_version_url(version):
 	# Find the URL for the specified version
 	version_data = next((item for item in manifest_data['versions'] if item["id"] == version), None)
 	if version_data is None:
-		print(f"Failed to find version {version}.")
+		tqdm.write(f"Failed to find version {version}.")
 		return None
 	return version_data['url']
 
 def check_lang_dir():
 	# Create the lang directories if they don't exist
 	if not os.path.exists('cache/lang/wurst'):
-		os.makedirs('cache/lang/wurst')
-	if not os.path.exists('cache/lang/mc'):
-		os.makedirs('cache/lang/mc')
-
-def download_langfile_official(version, lang_code):
-	check_lang_dir()
-
+		os.makedirs('cache/lang/wurst', exist_ok=True)
+	if not os.path.exists('cache/lang/mc/objects'):
+		os.makedirs('cache/lang/mc/objects', exist_ok=True)
+
+# Minecraft language files are stored under their SHA-1 hash, like Mojang's own asset storage,
+# so files that didn't change between versions are only stored once.
+# versions.json remembers which hash each version uses for each language.
+def get_blob_path(lang_file_hash):
+	return f"cache/lang/mc/objects/{lang_file_hash[:2]}/{lang_file_hash}"
+
+def save_blob(content):
+	lang_file_hash = hashlib.sha1(content).hexdigest()
+	path = get_blob_path(lang_file_hash)
+	# blobs are named after their content, so an existing one never needs to be written again
+	if os.path.isfile(path):
+		return lang_file_hash
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	http_client.write_bytes_atomic(path, content)
+	return lang_file_hash
+
+def load_version_map():
+	if not os.path.isfile('cache/lang/mc/versions.json'):
+		return {}
+	with open('cache/lang/mc/versions.json', 'r', encoding='utf-8') as f:
+		return json.load(f)
+
+def record_hash(version, lang_code, lang_file_hash):
+	# the locks keep parallel downloads (in this process or others) from overwriting each other's entries
+	with version_map_lock, file_lock.locked('cache/lang/mc/versions.json'):
+		version_map = load_version_map()
+		version_map.setdefault(version, {})[lang_code] = lang_file_hash
+		checkpoint.write_json_atomic('cache/lang/mc/versions.json', version_map)
+
+def get_mc_language_hashes(version):
 	# Fetch the version data
 	version_url = get_version_url(version)
 	if version_url is None:
-		return
-	version_response = requests.get(version_url)
-	version_data = json.loads(version_response.text)
+		return None
+	version_data = get_immutable_json(version_url)
 
-	# Fetch the asset index
+	# Fetch the asset index and find the hash of each language file in it
 	asset_index_url = version_data['assetIndex']['url']
-	asset_index_response = requests.get(asset_index_url)
-	asset_index_data = json.loads(asset_index_response.text)
+	asset_index_data = get_immutable_json(asset_index_url)
+	return {name[len('minecraft/lang/'):-len('.json')]: asset['hash'] for name, asset in asset_index_data['objects'].items() if name.startswith('minecraft/lang/') and name.endswith('.json')}
+
+def get_wurst_languages():
+	# list the language files in the Wurst7 repo
+	url = "https://api.github.com/repos/Wurst-Imperium/Wurst7/contents/src/main/resources/assets/wurst/lang"
+	headers = {"X-GitHub-Api-Version": "2022-11-28"}
+	if 'GITHUB_TOKEN' in os.environ:
+		headers["Authorization"] = f"Bearer {os.environ['GITHUB_TOKEN']}"
+	response = http_client.get(url, headers=headers)
+	response.raise_for_status()
+	return [file['name'][:-len('.json')] for file in response.json() if file['name'].endswith('.json')]
 
-	# Find the hash for the language file
-	lang_file_hash = asset_index_data['objects'][f'minecraft/lang/{lang_code}.json']['hash']
-
-	# Construct the URL for the language file
-	lang_file_url = f"https://resources.download.minecraft.net/{lang_file_hash[:2]}/{lang_file_hash}"
+def download_langfile_official(version, lang_code):
+	check_lang_dir()
 
-	# Download the language file
-	lang_file_response = requests.get(lang_file_url)
-	if lang_file_response.status_code == 200:
-		with open(f"cache/lang/mc/{lang_code}.json", 'wb') as f:
-			f.write(lang_file_response.content)
-		print(f"Successfully downloaded {lang_code}.json from official Mojang servers.")
-	else:
-		print(f"WARNING: Failed to download {lang_code}.json from official Mojang servers.")
-		print(f"URL: {lang_file_url}")
-		print(f"Status Code: {lang_file_response.status_code}")
-		print(f"Response Content: {lang_file_response.content}")
+	# Find the hash for the language file
+	language_hashes = get_mc_language_hashes(version)
+	if language_hashes is None:
+		return None
+	lang_file_hash = language_hashes[lang_code]
+
+	# Only download the language file if no other version had the same one
+	if not os.path.isfile(get_blob_path(lang_file_hash)):
+		# Construct the URL for the language file
+		lang_file_url = f"https://resources.download.minecraft.net/{lang_file_hash[:2]}/{lang_file_hash}"
+
+		# Download the language file
+		lang_file_response = http_client.get(lang_file_url)
+		if lang_file_response.status_code != 200:
+			tqdm.write(f"WARNING: Failed to download {lang_code}.json from official Mojang servers.")
+			tqdm.write(f"URL: {lang_file_url}")
+			tqdm.write(f"Status Code: {lang_file_response.status_code}")
+			tqdm.write(f"Response Content: {lang_file_response.content}")
+			return None
+		if hashlib.sha1(lang_file_response.content).hexdigest() != lang_file_hash:
+			tqdm.write(f"WARNING: Downloaded {lang_code}.json doesn't match its hash from the asset index.")
+			tqdm.write(f"URL: {lang_file_url}")
+			return None
+		save_blob(lang_file_response.content)
+		tqdm.write(f"Successfully downloaded {lang_code}.json from official Mojang servers.")
+
+	record_hash(version, lang_code, lang_file_hash)
+	return lang_file_hash
 
 def download_langfile_unofficial(version, lang_code):
 	check_lang_dir()
 	url = f"https://raw.githubusercontent.com/InventivetalentDev/minecraft-assets/{version}/assets/minecraft/lang/{lang_code}.json"
-	response = requests.get(url)
-	if response.status_code == 200:
-		with open(f"cache/lang/mc/{lang_code}.json", 'wb') as f:
-			f.write(response.content)
-		print(f"Successfully downloaded {lang_code}.json from InventivetalentDev.")
-	else:
-		print(f"WARNING: Failed to download {lang_code}.json from InventivetalentDev.")
-		print(f"URL: {url}")
-		print(f"Status Code: {response.status_code}")
-		print(f"Response Content: {response.content}")
+	response = http_client.get(url)
+	if response.status_code != 200:
+		tqdm.write(f"WARNING: Failed to download {lang_code}.json from InventivetalentDev.")
+		tqdm.write(f"URL: {url}")
+		tqdm.write(f"Status Code: {response.status_code}")
+		tqdm.write(f"Response Content: {response.content}")
+		return None
+	# there's no official hash to check this file against, so it's stored under its own hash
+	lang_file_hash = save_blob(response.content)
+	tqdm.write(f"Successfully downloaded {lang_code}.json from InventivetalentDev.")
+	record_hash(version, lang_code, lang_file_hash)
+	return lang_file_hash
+
+def get_mc_langfile_path(language):
+	# download mc language file if the latest version's file isn't stored yet
+	version = get_latest_version()
+	lang_file_hash = load_version_map().get(version, {}).get(language)
+	if lang_file_hash is None or not os.path.isfile(get_blob_path(lang_file_hash)):
+		if language == "en_us":
+			lang_file_hash = download_langfile_unofficial(version, language)
+		else:
+			lang_file_hash = download_langfile_official(version, language)
+	if lang_file_hash is None:
+		raise FileNotFoundError(f"Failed to download the Minecraft language file for {language}.")
+	return get_blob_path(lang_file_hash)
 
 def download_langfile_wurst(lang_code):
 	check_lang_dir()
 	url = f"https://raw.githubusercontent.com/Wurst-Imperium/Wurst7/master/src/main/resources/assets/wurst/lang/{lang_code}.json"
-	response = requests.get(url)
-	if response.status_code == 200:
-		with open(f"cache/lang/wurst/{lang_code}.json", 'wb') as f:
-			f.write(response.content)
-		print(f"Successfully downloaded {lang_code}.json from Wurst.")
+	# only download the file if it has changed since the last check
+	_, response = http_client.get_cached(url, f"cache/lang/wurst/{lang_code}.json", max_age=WURST_MAX_AGE)
+	if response is not None and response.status_code == 200:
+		tqdm.write(f"Successfully downloaded {lang_code}.json from Wurst.")
 	# else:
 	# 	print(f"WARNING: Failed to download {lang_code}.json from Wurst.")
 	#	print(f"URL: {url}")
@@ -100,20 +183,13 @@ def download_langfile_wurst(lang_code):
 	#	print(f"Response Content: {response.content}")
 
 def load_merged_langfile(language):
-	# download mc language file if it doesn't exist
-	if not os.path.exists(f"cache/lang/mc/{language}.json"):
-		version = get_latest_version()
-		if language == "en_us":
-			download_langfile_unofficial(version, language)
-		else:
-			download_langfile_official(version, language)
+	mc_langfile_path = get_mc_langfile_path(language)
 
-	# download wurst language file if it doesn't exist
-	if not os.path.exists(f"cache/lang/wurst/{language}.json"):
-		download_langfile_wurst(language)
+	# download wurst language file if it doesn't exist or has changed
+	download_langfile_wurst(language)
 
 	# load language files
-	with open(f"cache/lang/mc/{language}.json", "r", encoding="utf-8") as f:
+	with open(mc_langfile_path, "r", encoding="utf-8") as f:
 		mc_lang = json.load(f)
 	if os.path.exists(f"cache/lang/wurst/{language}.json"):
 		with open(f"cache/lang/wurst/{language}.json", "r", encoding="utf-8") as f:
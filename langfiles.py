@@ -1,55 +1,95 @@
 """
-Keeps track of the original and pending langfiles and ensures that any missing files get downloaded.
+Keeps track of the original and pending langfiles and ensures that any missing files get downloaded. Everything is loaded the first time it's needed, so scripts that only need the langcode don't have to load (or download) the langfiles.
 """
 import json
 import os
+import threading
 import langfile_downloader
 import download_pending
+import workspace
 
-# download en_us.json if it doesn't exist
-if not os.path.isfile('cache/lang/wurst/en_us.json'):
-	print("Downloading en_us.json from Wurst...")
-	langfile_downloader.download_langfile_wurst("en_us")
+original = None
+original_lock = threading.Lock()
+pending = None
+pending_lock = threading.Lock()
+langcode = None
+langcode_lock = threading.Lock()
+old_translation = None
+old_translation_lock = threading.Lock()
+ensure_pending_lock = threading.Lock()
 
-# load original as dict
-with open('cache/lang/wurst/en_us.json', encoding='utf-8') as f:
-	original = json.load(f)
+def get_original():
+	global original
+	with original_lock:
+		if original is None:
+			# download en_us.json if it doesn't exist or has changed
+			langfile_downloader.download_langfile_wurst("en_us")
 
-# check if pending.json exists
-if not os.path.isfile('pending.json'):
-	url = input("No pending translation found. To download it from a pull request, please enter the URL: ")
-	if url:
-		download_pending.download_pending(url)
-	else:
-		exit()
+			# load original as dict
+			with open('cache/lang/wurst/en_us.json', encoding='utf-8') as f:
+				original = json.load(f)
+	return original
+
+def ensure_pending():
+	# check if pending.json exists
+	with ensure_pending_lock:
+		if not os.path.isfile(workspace.get_path('pending.json')):
+			url = input("No pending translation found. To download it from a pull request, please enter the URL: ")
+			if url:
+				download_pending.download_pending(url)
+			else:
+				exit()
+
+def get_pending():
+	global pending
+	with pending_lock:
+		if pending is None:
+			ensure_pending()
+
+			# load pending as dict
+			with open(workspace.get_path('pending.json'), encoding='utf-8') as f:
+				pending = json.load(f)
+
+			# remove pending strings that are identical to the old translation
+			old_translation = get_old_translation()
+			for key in list(pending.keys()):
+				if key in old_translation and pending[key] == old_translation[key]:
+					pending.pop(key)
+	return pending
 
-# load pending as dict
-with open('pending.json', encoding='utf-8') as f:
-	pending = json.load(f)
+def get_langcode():
+	global langcode
+	with langcode_lock:
+		if langcode is None:
+			ensure_pending()
 
-# load langcode
-with open('pending_lang.txt', encoding='utf-8') as f:
-	langcode = f.read().strip()
+			# load langcode
+			with open(workspace.get_path('pending_lang.txt'), encoding='utf-8') as f:
+				langcode = f.read().strip()
+	return langcode
+
+def get_langcode_short():
+	langcode = get_langcode()
 	if langcode == "zh_cn":
-		langcode_short = "zh-cn"
+		return "zh-cn"
 	elif langcode == "zh_tw":
-		langcode_short = "zh-tw"
+		return "zh-tw"
 	else:
-		langcode_short = langcode.split('_')[0]
-
-# try to download old translation
-if not os.path.isfile(f'cache/lang/wurst/{langcode}.json'):
-	print(f"Downloading {langcode}.json from Wurst...")
-	langfile_downloader.download_langfile_wurst(langcode)
-
-# try to load old translation
-if os.path.isfile(f'cache/lang/wurst/{langcode}.json'):
-	with open(f'cache/lang/wurst/{langcode}.json', encoding='utf-8') as f:
-		old_translation = json.load(f)
-else:
-	old_translation = {}
-
-# remove pending strings that are identical to the old translation
-for key in list(pending.keys()):
-	if key in old_translation and pending[key] == old_translation[key]:
-		pending.pop(key)
+		return langcode.split('_')[0]
+
+def get_old_translation():
+	global old_translation
+	with old_translation_lock:
+		if old_translation is None:
+			langcode = get_langcode()
+
+			# try to download old translation, or update it if it has changed
+			langfile_downloader.download_langfile_wurst(langcode)
+
+			# try to load old translation
+			if os.path.isfile(f'cache/lang/wurst/{langcode}.json'):
+				with open(f'cache/lang/wurst/{langcode}.json', encoding='utf-8') as f:
+					old_translation = json.load(f)
+			else:
+				old_translation = {}
+	return old_translation
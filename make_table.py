@@ -2,14 +2,37 @@
 Creates the table.html file and requests all the necessary data from the other scripts.
 """
 import re
-import pandas as pd
 import html
-from langfiles import original, pending, langcode_short
-from google_translate import reversed, gt_identical, gt_reversible, gt_reversible_artifacts
-from evaluate import evals
-from gpt_extract_mcnames import mcnames
-from gpt_embeddings import low_distance_any, get_low_distance_message
+import html_table
+import http_client
+import langfiles
+import gpt_extract_mcnames
+import gpt_embeddings
+from gpt_embeddings import get_low_distance_message
 import namefinder
+import pipeline
+import rules
+import workspace
+
+# ask everything that needs user input before the stages start running in the background
+langfiles.get_pending()
+gpt_extract_mcnames.confirm_analysis()
+
+# fork the processes for the per-string checks of large files while this is still the only thread
+rules.start_workers(len(langfiles.get_pending()))
+
+# run all the analysis stages, with independent ones running in parallel
+results = pipeline.run(["evals"])
+original = results["original"]
+pending = results["pending"]
+langcode_short = langfiles.get_langcode_short()
+reversed = results["reversed"]
+gt_identical = results["comparison"]["identical"]
+gt_reversible = results["comparison"]["reversible"]
+gt_reversible_artifacts = results["comparison"]["reversible_artifacts"]
+mcnames = results["mcnames"]
+low_distance_any = gpt_embeddings.get_low_distance_any()
+evals = results["evals"]
 
 def get_preformatted_translation(set, key):
 	translation = set.get(key, "(no data)")
@@ -72,30 +95,21 @@ def highlight_mcnames(key, original_value, pending_value):
 	return original_value, pending_value
 
 def apply_replacements(string, replacements):
-	# remove replacements that are contained in other replacements
-	repl_copy = replacements.copy()
-	for i in range(len(replacements) - 1, -1, -1):
-		start, end, _ = replacements[i]
-		for i2 in range(len(repl_copy) - 1, -1, -1):
-			if i == i2:
-				continue
-			other_start, other_end, _ = repl_copy[i2]
-			if start >= other_start and end <= other_end:
-				del replacements[i]
-				break
-	del repl_copy
-	# sort by start position in reverse order
-	replacements.sort(key=lambda x: x[0], reverse=True)
-	# replace each part in reverse order
+	# sort by start position, putting the longest replacement first when several start at the same position
+	replacements = sorted(replacements, key=lambda x: (x[0], -x[1]))
+	# skip replacements that are contained in or overlap with an earlier one and assemble the rest in one go
+	parts = []
+	position = 0
 	for start, end, replacement in replacements:
-		string = string[:start] + replacement + string[end:]
-	return string
+		if start < position:
+			continue
+		parts.append(string[position:start])
+		parts.append(replacement)
+		position = end
+	parts.append(string[position:])
+	return "".join(parts)
 
-# create table
-df = pd.DataFrame(columns=["Key", "Evaluation", "Pending", "Reverse-Translated", "Original"])
-
-# add rows to table
-for key in pending.keys():
+def format_row(key):
 	evaluation_value = format_evaluation(key)
 	original_value = get_preformatted_translation(original, key)
 	pending_value = get_preformatted_translation(pending, key)
@@ -121,14 +135,7 @@ for key in pending.keys():
 	pending_value = format_translation(pending_value)
 	reversed_value = format_translation(reversed_value)
 
-	row = {"Key": html.escape(key), "Evaluation": evaluation_value, "Pending": pending_value, "Reverse-Translated": reversed_value, "Original": original_value}
-	df = pd.concat([df, pd.DataFrame(row, index=[0])])
-
-# convert dataframe to html table
-html_table = df.to_html(index=False, justify='center', escape=False)
-html_table += f"<div class='general-evaluation'>{format_evaluation('_general_')}</div>"
-html_table += "<div class='progress-bar'></div>"
-html_table += f"<meta lang='{langcode_short}'>"
+	return [html.escape(key), evaluation_value, pending_value, reversed_value, original_value]
 
 css = """
 <style>
@@ -334,6 +341,17 @@ document.addEventListener('keydown', (event) => {
 </script>
 """
 
-# save table to file
-with open('table.html', 'w', encoding='utf-8') as f:
-	f.write("<!DOCTYPE html>\n" + css + html_table + js)
+# save table to file, writing each row as soon as it's ready
+with open(workspace.get_path('table.html'), 'w', encoding='utf-8') as f:
+	f.write("<!DOCTYPE html>\n" + css)
+	html_table.write_table_start(f, ["Key", "Evaluation", "Pending", "Reverse-Translated", "Original"])
+	for key in pending.keys():
+		html_table.write_table_row(f, format_row(key))
+	html_table.write_table_end(f)
+	f.write(f"<div class='general-evaluation'>{format_evaluation('_general_')}</div>")
+	f.write("<div class='progress-bar'></div>")
+	f.write(f"<meta lang='{langcode_short}'>")
+	f.write(js)
+
+# show how much time was spent on network requests
+http_client.print_stats()
@@ -2,36 +2,76 @@
 Detects names of Wurst features as well as anything in names.txt.
 This doesn't include Minecraft names. See gpt_extract_mcnames.py for that.
 """
+import functools
 import re
-from wiki_data import wiki_data
+import threading
+import wiki_data
 
-names = []
+# how many texts to remember the matches for, evaluate.py and make_table.py look at the same texts several times
+MAX_CACHED_TEXTS = 4096
 
-# add feature names from wiki data
-for name in wiki_data.keys():
-	names.append(name)
+pattern = None
+pattern_lock = threading.Lock()
 
-# add special names from names.txt
-with open('names.txt', 'r', encoding='utf-8') as f:
-	for line in f:
-		line = line.strip()
-		if line.startswith('#'):
+def get_names_list():
+	names = []
+
+	# add feature names from wiki data
+	for name in wiki_data.get_wiki_data().keys():
+		names.append(name)
+
+	# add special names from names.txt
+	with open('names.txt', 'r', encoding='utf-8') as f:
+		for line in f:
+			line = line.strip()
+			if line.startswith('#'):
+				continue
+			names.append(line)
+	return names
+
+def build_trie_pattern(names):
+	# merge the names into a trie, so that names with a common prefix share one branch of the regular expression
+	trie = {}
+	for name in names:
+		if name == "":
 			continue
-		names.append(line)
+		node = trie
+		for char in name:
+			node = node.setdefault(char, {})
+		node[""] = {}
+	return trie_to_pattern(trie)
 
-# generate a regular expression pattern that matches all the names in the list
-pattern = re.compile('|'.join(map(re.escape, names)))
+def trie_to_pattern(node):
+	# e.g. "ESP", "Excavator" and "Extra" become E(?:SP|x(?:cavator|tra))
+	alternatives = [re.escape(char) + trie_to_pattern(child) for char, child in sorted(node.items()) if char != ""]
+	if not alternatives:
+		return ""
+	pattern = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+	# a name that is a prefix of other names makes the rest optional, and the greedy "?" prefers the longest name
+	if "" in node:
+		pattern = f"(?:{pattern})?"
+	return pattern
+
+def get_pattern():
+	global pattern
+	with pattern_lock:
+		if pattern is None:
+			# generate a regular expression pattern that matches the longest name at each position
+			pattern = re.compile(build_trie_pattern(get_names_list()))
+	return pattern
+
+@functools.lru_cache(maxsize=MAX_CACHED_TEXTS)
+def find_names(text):
+	return tuple(get_pattern().finditer(text))
 
 # highlight all names in text
 def mark_names(text):
-	return re.sub(pattern, lambda m: f"<mark class='name'>{m.group(0)}</mark>", text)
+	return re.sub(get_pattern(), lambda m: f"<mark class='name'>{m.group(0)}</mark>", text)
 
 # get all names as strings
 def get_names(text):
-	return re.findall(pattern, text)
+	return [match.group(0) for match in find_names(text)]
 
 # get all names as match objects
 def get_name_matches(text):
-	return re.finditer(pattern, text)
-
-# TODO: It might make sense to cache this, since the regex can be quite slow.
+	return find_names(text)
@@ -0,0 +1,9 @@
+"""
+The request scheduler shared by all scripts that talk to the OpenAI API, so that they all adapt to the same rate limits.
+"""
+import rate_limit
+
+MAX_CONCURRENCY = 20
+INITIAL_CONCURRENCY = 4
+
+scheduler = rate_limit.AdaptiveScheduler(MAX_CONCURRENCY, INITIAL_CONCURRENCY)
@@ -0,0 +1,108 @@
+"""
+Runs the analysis as a graph of stages. Each stage declares the stages whose outputs it needs, and all stages whose inputs are ready run in parallel. For example, the mcnames extraction only needs the langfiles, so it runs while Google Translate is still busy. Stages get their inputs through the same lazy accessors that everything else uses, so the declared inputs decide the order and the accessors make sure each stage runs only once. The accessors are locked, so a stage that reads something it didn't declare waits for it instead of computing it a second time.
+"""
+import concurrent.futures
+import time
+import langfiles
+import google_translate
+import gpt_extract_mcnames
+import gpt_embeddings
+import wiki_data
+
+MAX_WORKERS = 4
+
+stages = {}
+
+def stage(name, inputs, function):
+	stages[name] = {"inputs": inputs, "function": function}
+
+def evaluate_all():
+	# evaluate.py does its checks when it's imported
+	import evaluate
+	return evaluate.evals
+
+stage("langcode", [], langfiles.get_langcode)
+stage("original", [], langfiles.get_original)
+stage("old_translation", ["langcode"], langfiles.get_old_translation)
+stage("pending", ["old_translation"], langfiles.get_pending)
+stage("wiki_data", [], wiki_data.get_wiki_data)
+stage("forward", ["original", "langcode"], google_translate.get_forward)
+stage("reversed", ["pending", "langcode"], google_translate.get_reversed)
+stage("forward_reverse", ["forward"], google_translate.get_forward_reverse)
+stage("comparison", ["original", "pending", "forward", "reversed", "forward_reverse"], google_translate.get_comparison)
+stage("mcnames", ["original", "pending", "langcode"], gpt_extract_mcnames.get_mcnames)
+stage("low_distances", ["original", "pending", "forward", "reversed", "forward_reverse"], gpt_embeddings.get_low_distances)
+stage("evals", ["original", "pending", "old_translation", "forward", "comparison", "mcnames", "low_distances", "wiki_data"], evaluate_all)
+
+def get_needed_stages(targets):
+	# the targets and everything they depend on, checking for unknown stages and cycles along the way
+	needed = set()
+	def visit(name, path):
+		if name not in stages:
+			raise ValueError(f"Unknown stage: {name}")
+		if name in path:
+			raise ValueError(f"Cycle in stage graph: {' -> '.join(path + [name])}")
+		if name in needed:
+			return
+		for input_name in stages[name]["inputs"]:
+			visit(input_name, path + [name])
+		needed.add(name)
+	for target in targets:
+		visit(target, [])
+	return needed
+
+def run(targets):
+	# runs the given stages and everything they depend on, returns the output of each stage that ran
+	needed = get_needed_stages(targets)
+	results = {}
+	timings = {}
+	start_time = time.perf_counter()
+	with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+		future_to_name = {}
+
+		def submit_ready_stages():
+			running = set(future_to_name.values())
+			for name in sorted(needed):
+				if name in results or name in running:
+					continue
+				if all(input_name in results for input_name in stages[name]["inputs"]):
+					future_to_name[executor.submit(run_stage, name)] = name
+
+		submit_ready_stages()
+		while future_to_name:
+			done, _ = concurrent.futures.wait(future_to_name.keys(), return_when=concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				name = future_to_name.pop(future)
+				try:
+					results[name], timings[name] = future.result()
+				except BaseException:
+					# don't start any more stages after a failure or Ctrl+C
+					executor.shutdown(wait=False, cancel_futures=True)
+					raise
+			submit_ready_stages()
+	print_report(timings, time.perf_counter() - start_time)
+	return results
+
+def run_stage(name):
+	start = time.perf_counter()
+	output = stages[name]["function"]()
+	return output, (start, time.perf_counter())
+
+def get_critical_path(timings):
+	# the chain of stages that bounds the wall time: start at the stage that finished last and keep following the input that finished last
+	name = max(timings, key=lambda name: timings[name][1])
+	path = [name]
+	while True:
+		inputs = [input_name for input_name in stages[name]["inputs"] if input_name in timings]
+		if not inputs:
+			break
+		name = max(inputs, key=lambda input_name: timings[input_name][1])
+		path.append(name)
+	return path[::-1]
+
+def print_report(timings, wall_time):
+	durations = {name: end - start for name, (start, end) in timings.items()}
+	print("Stage times: " + ", ".join(f"{name} {duration:.1f}s" for name, duration in sorted(durations.items(), key=lambda item: -item[1])))
+	critical_path = get_critical_path(timings)
+	critical_time = sum(durations[name] for name in critical_path)
+	print(f"Critical path: {' -> '.join(critical_path)} ({critical_time:.1f}s of {wall_time:.1f}s wall time, all stages add up to {sum(durations.values()):.1f}s)")
@@ -0,0 +1,46 @@
+"""
+Downloads every Minecraft and Wurst language file in parallel, so that multi-language reviews and offline runs start with a warm cache.
+"""
+import concurrent.futures
+import time
+import http_client
+import langfile_downloader
+from tqdm import tqdm
+
+MAX_WORKERS = 16
+
+def prefetch_all():
+	start_time = time.perf_counter()
+
+	# resolve the shared metadata once before starting the workers
+	langfile_downloader.check_lang_dir()
+	version = langfile_downloader.get_latest_version()
+	mc_languages = list(langfile_downloader.get_mc_language_hashes(version))
+	# en_us isn't in the asset index, so it's downloaded from InventivetalentDev
+	if "en_us" not in mc_languages:
+		mc_languages.append("en_us")
+	wurst_languages = langfile_downloader.get_wurst_languages()
+	print(f"Prefetching {len(mc_languages)} Minecraft {version} and {len(wurst_languages)} Wurst language files...")
+
+	failed = []
+	with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+		future_to_file = {}
+		for language in mc_languages:
+			future_to_file[executor.submit(langfile_downloader.get_mc_langfile_path, language)] = f"mc/{language}"
+		for language in wurst_languages:
+			future_to_file[executor.submit(langfile_downloader.download_langfile_wurst, language)] = f"wurst/{language}"
+		for future in tqdm(concurrent.futures.as_completed(future_to_file), total=len(future_to_file), desc="Language files", unit="file"):
+			try:
+				future.result()
+			except Exception as e:
+				tqdm.write(f"WARNING: Failed to prefetch {future_to_file[future]}: {e}")
+				failed.append(future_to_file[future])
+
+	elapsed = time.perf_counter() - start_time
+	print(f"Prefetched {len(future_to_file) - len(failed)} of {len(future_to_file)} language files in {elapsed:.1f}s.")
+	if failed:
+		print(f"Failed: {', '.join(sorted(failed))}")
+
+if __name__ == "__main__":
+	prefetch_all()
+	http_client.print_stats()
@@ -0,0 +1,152 @@
+"""
+Thread-safe rate limiting for the scripts that send lots of requests to external APIs.
+"""
+import collections
+import re
+import threading
+import time
+import concurrent.futures
+
+class TokenBucket:
+	"""
+	Allows up to `rate` requests per second on average, with bursts of up to `capacity` requests. Every worker thread calls acquire() before sending a request.
+	"""
+	def __init__(self, rate, capacity=1):
+		self.rate = rate
+		self.capacity = capacity
+		self.tokens = capacity
+		self.updated = time.monotonic()
+		self.paused_until = 0
+		self.lock = threading.Lock()
+
+	def acquire(self):
+		while True:
+			with self.lock:
+				now = time.monotonic()
+				self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+				self.updated = now
+				if now >= self.paused_until and self.tokens >= 1:
+					self.tokens -= 1
+					return
+				wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+			time.sleep(wait)
+
+	def pause(self, seconds):
+		# stop handing out tokens to all threads, e.g. after the server says we're going too fast
+		with self.lock:
+			self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+def parse_duration(value):
+	# parses durations like "1s", "6m0s" or "120ms" from OpenAI's rate-limit headers
+	units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+	return sum(float(amount) * units[unit] for amount, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value))
+
+class AdaptiveScheduler:
+	"""
+	Runs requests on a thread pool and adjusts how many of them may be in flight at once, like TCP's AIMD: the limit grows by one after `limit` successful responses and is halved when a request gets rate limited, the server fails with a 5xx error, or the x-ratelimit-remaining-* headers say that the quota is running low. Requests wait in a queue until a slot is free and are only handed to the thread pool then, so no thread is ever blocked while waiting. Requests that fail with a 429 are resubmitted after the retry-after delay, and callers can schedule their own retries with a delay.
+	"""
+	def __init__(self, max_concurrency, initial_concurrency=4, max_rate_limit_retries=5, low_quota_fraction=0.1):
+		self.max_concurrency = max_concurrency
+		self.limit = min(initial_concurrency, max_concurrency)
+		self.max_rate_limit_retries = max_rate_limit_retries
+		self.low_quota_fraction = low_quota_fraction
+		self.queue = collections.deque()
+		self.in_flight = 0
+		self.paused_until = 0
+		self.resume_at = 0
+		self.last_decrease = 0
+		self.lock = threading.Lock()
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+
+	def submit(self, fn, *args, delay=0):
+		# returns a future right away, fn(*args) runs once the delay is over and a slot is free
+		future = concurrent.futures.Future()
+		self.schedule(future, fn, args, delay, 0)
+		return future
+
+	def schedule(self, future, fn, args, delay, rate_limit_retries):
+		job = (future, fn, args, rate_limit_retries)
+		if delay > 0:
+			timer = threading.Timer(delay, self.enqueue, (job,))
+			timer.daemon = True
+			timer.start()
+		else:
+			self.enqueue(job)
+
+	def enqueue(self, job):
+		with self.lock:
+			self.queue.append(job)
+		self.dispatch()
+
+	def dispatch(self):
+		# hand queued jobs to the thread pool while there are free slots, or come back once a pause is over
+		with self.lock:
+			now = time.monotonic()
+			if self.paused_until > now:
+				if self.resume_at < self.paused_until:
+					self.resume_at = self.paused_until
+					timer = threading.Timer(self.paused_until - now, self.dispatch)
+					timer.daemon = True
+					timer.start()
+				return
+			while self.queue and self.in_flight < int(self.limit):
+				self.in_flight += 1
+				self.executor.submit(self.run, *self.queue.popleft())
+
+	def run(self, future, fn, args, rate_limit_retries):
+		try:
+			if rate_limit_retries == 0 and not future.set_running_or_notify_cancel():
+				return
+			try:
+				result = fn(*args)
+			except BaseException as e:
+				response = getattr(e, "response", None)
+				if getattr(response, "status_code", None) == 429 and rate_limit_retries < self.max_rate_limit_retries:
+					self.schedule(future, fn, args, self.get_retry_after(response), rate_limit_retries + 1)
+				else:
+					future.set_exception(e)
+			else:
+				future.set_result(result)
+		finally:
+			with self.lock:
+				self.in_flight -= 1
+			self.dispatch()
+
+	def get_retry_after(self, response):
+		try:
+			return float(response.headers.get("retry-after", 1))
+		except ValueError:
+			return 1
+
+	def record_response(self, response):
+		# call this with every response, before raise_for_status()
+		headers = response.headers
+		with self.lock:
+			now = time.monotonic()
+			if response.status_code == 429:
+				self.paused_until = max(self.paused_until, now + self.get_retry_after(response))
+				self.decrease(now)
+			elif response.status_code >= 500:
+				# an overloaded server is a reason to slow down, not to speed up
+				self.decrease(now)
+			elif self.quota_is_low(headers, "requests") or self.quota_is_low(headers, "tokens"):
+				self.decrease(now)
+			else:
+				self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+	def decrease(self, now):
+		# only halve once per second, since all responses that are in flight will report the same problem
+		if now - self.last_decrease >= 1:
+			self.limit = max(1, self.limit / 2)
+			self.last_decrease = now
+
+	def quota_is_low(self, headers, kind):
+		try:
+			limit = int(headers[f"x-ratelimit-limit-{kind}"])
+			remaining = int(headers[f"x-ratelimit-remaining-{kind}"])
+		except (KeyError, ValueError):
+			return False
+		# wait for the quota to reset if it's used up
+		if remaining <= 0 and f"x-ratelimit-reset-{kind}" in headers:
+			self.paused_until = max(self.paused_until, time.monotonic() + parse_duration(headers[f"x-ratelimit-reset-{kind}"]))
+		return remaining < limit * self.low_quota_fraction
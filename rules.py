@@ -0,0 +1,229 @@
+"""
+The per-string checks of evaluate.py, written as rules that a single engine runs in one pass over each key. Rules share the tokens of a key, like its formatting codes or names, so each token is only computed once, and only if some rule needs it. The time spent in each rule is counted, see print_times(). Large sets of keys can be split across several processes, see start_workers().
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import aho_corasick
+import namefinder
+
+CODE_PATTERN = re.compile(r"§[0-9a-fk-or]|%[sdf]")
+COLOR_PATTERN = re.compile(r"§[0-9a-fk-or](black|dark blue|dark green|dark aqua|dark red|dark purple|gold|gray|dark gray|blue|green|aqua|red|light purple|yellow|white|orange)§r")
+
+# below this many keys per process, starting the processes takes longer than the checks themselves
+MIN_KEYS_PER_PROCESS = 2000
+MAX_PROCESSES = os.cpu_count() or 1
+
+# the read-only inputs of the rules, see init()
+data = None
+feature_name_automaton = None
+# the worker processes, see start_workers()
+executor = None
+
+rules = []
+rule_times = {}
+
+def rule(name, function):
+	rules.append((name, function))
+	rule_times[name] = 0.0
+
+def init(original, pending, mcnames, feature_names):
+	global data, feature_name_automaton
+	if data is None or data["feature_names"] != feature_names:
+		feature_name_automaton = aho_corasick.Automaton(feature_names, ignore_case=True)
+	data = {"original": original, "pending": pending, "mcnames": mcnames, "feature_names": feature_names}
+
+# tokens that more than one rule might need, computed on first use
+token_functions = {
+	"original": lambda tokens: data["original"].get(tokens.key, ""),
+	"pending": lambda tokens: data["pending"][tokens.key],
+	"original_codes": lambda tokens: CODE_PATTERN.findall(tokens["original"]),
+	"pending_codes": lambda tokens: CODE_PATTERN.findall(tokens["pending"]),
+	"original_newlines": lambda tokens: tokens["original"].count("\n"),
+	"pending_newlines": lambda tokens: tokens["pending"].count("\n"),
+	"original_names": lambda tokens: namefinder.get_names(tokens["original"]),
+	"pending_names": lambda tokens: namefinder.get_names(tokens["pending"]),
+}
+
+# the tokens of one key, missing ones are computed with token_functions
+class Tokens(dict):
+	def __init__(self, key):
+		super().__init__()
+		self.key = key
+	def __missing__(self, name):
+		value = self[name] = token_functions[name](self)
+		return value
+
+def add_message(evaluation, category, message):
+	if category not in evaluation:
+		evaluation[category] = []
+	evaluation[category].append(message)
+
+# check extracted Minecraft names
+def check_mcnames(key, tokens, evaluation):
+	if key not in data["mcnames"]:
+		return
+	pending_lower = tokens["pending"].lower()
+	for name in data["mcnames"][key]:
+		translation = name["translation"]
+		original_singular = name["original_singular"]
+		translation_key = name["translation_key"]
+		official_translation = name["official_translation"]
+		if translation.lower() not in pending_lower:
+			# if the translation isn't actually in pending, just add an info with the official translation
+			add_message(evaluation, "info", f"Minecraft translates \"{original_singular}\" ({translation_key}) as \"{official_translation}\".")
+		elif translation.lower() == official_translation.lower():
+			add_message(evaluation, "good_signs", f"Minecraft translates \"{original_singular}\" ({translation_key}) as \"{official_translation}\", which is consistent with this translation.")
+		else:
+			add_message(evaluation, "warnings", f"Possible inconsistency: Minecraft translates \"{original_singular}\" ({translation_key}) as \"{official_translation}\", but this translation says \"{translation}\" instead.")
+
+# check for miscapitalized names
+def check_capitalization(key, tokens, evaluation):
+	text = tokens["pending"]
+	feature_names = data["feature_names"]
+	# sort by name, then position, to report errors in the same order as one search per name would
+	matches = sorted(feature_name_automaton.iter_matches(text), key=lambda m: (m[2], m[0]))
+	last_end = {}
+	for start, end, index in matches:
+		name = feature_names[index]
+		# skip overlapping matches of the same name
+		if start < last_end.get(index, 0):
+			continue
+		last_end[index] = end
+		match = text[start:end]
+		# ignore .commands
+		if start > 0 and text[start - 1] == ".":
+			continue
+		# ignore .help commands
+		if start > 6 and text[start - 6:start] == ".help ":
+			continue
+		# ignore correctly capitalized names
+		if match == name:
+			continue
+		add_message(evaluation, "errors", f"Miscapitalized feature name: {match} (should be {name})")
+
+# compare formatting codes
+def check_codes(key, tokens, evaluation):
+	if tokens["original_codes"] != tokens["pending_codes"]:
+		add_message(evaluation, "warnings", f"Formatting codes have changed: {''.join(tokens['original_codes'])} -> {''.join(tokens['pending_codes'])}")
+
+# compare line breaks
+def check_line_breaks(key, tokens, evaluation):
+	if tokens["original_newlines"] != tokens["pending_newlines"]:
+		add_message(evaluation, "warnings", "Line breaks have changed.")
+
+# check for deleted/changed names
+def check_names(key, tokens, evaluation):
+	pending_names = set(tokens["pending_names"])
+	# report them in the order they appear in the original
+	for name in dict.fromkeys(tokens["original_names"]):
+		if name not in pending_names:
+			add_message(evaluation, "warnings", f"Name \"{name}\" is present in the original but not in the translation.")
+
+# check for untranslated colors
+def check_colors(key, tokens, evaluation):
+	# check if original has any colors
+	if COLOR_PATTERN.search(tokens["original"]) is None:
+		return
+	# check if pending has any colors
+	for match in COLOR_PATTERN.finditer(tokens["pending"]):
+		add_message(evaluation, "errors", f"The color \"{match.group(1)}\" was not translated.")
+
+rule("mcnames", check_mcnames)
+rule("capitalization", check_capitalization)
+rule("codes", check_codes)
+rule("line_breaks", check_line_breaks)
+rule("names", check_names)
+rule("colors", check_colors)
+
+def evaluate_key(key):
+	# run all rules on one pending key, in the order they were added
+	tokens = Tokens(key)
+	evaluation = {}
+	for name, function in rules:
+		start = time.perf_counter()
+		function(key, tokens, evaluation)
+		rule_times[name] += time.perf_counter() - start
+	return evaluation
+
+def evaluate_keys(keys):
+	# returns the evaluations of the keys that got any messages
+	evaluations = {}
+	for key in keys:
+		evaluation = evaluate_key(key)
+		if evaluation:
+			evaluations[key] = evaluation
+	return evaluations
+
+def get_process_count(key_count):
+	return max(1, min(MAX_PROCESSES, key_count // MIN_KEYS_PER_PROCESS))
+
+def can_fork():
+	# forking is only safe on Linux (macOS switched to spawn for that reason), and only while no other thread
+	# is running, since the forked processes would inherit any locks those threads are holding at that moment
+	return sys.platform.startswith("linux") and threading.active_count() == 1
+
+def start_workers(key_count):
+	# forks the worker processes for evaluate_keys_in_parallel(), call this before any other threads are started.
+	# other start methods would run make_table.py again in each process, so without fork the rules run in this process
+	global executor
+	process_count = get_process_count(key_count)
+	if executor is not None or process_count == 1 or not can_fork():
+		return
+	executor = concurrent.futures.ProcessPoolExecutor(max_workers=process_count, mp_context=multiprocessing.get_context("fork"))
+	# all processes are forked on the first submit, before the executor starts its own thread
+	executor.submit(os.getpid).result()
+
+def stop_workers():
+	global executor
+	if executor is not None:
+		executor.shutdown()
+		executor = None
+
+def evaluate_chunk(inputs, names_pattern, keys):
+	# runs in a worker that was forked before the inputs were loaded, so they come with each chunk
+	init(**inputs)
+	if namefinder.pattern is None or namefinder.pattern.pattern != names_pattern:
+		namefinder.pattern = re.compile(names_pattern)
+		namefinder.find_names.cache_clear()
+	# return the rule times of this chunk only, so the main process can add them up
+	for name in rule_times:
+		rule_times[name] = 0.0
+	return evaluate_keys(keys), rule_times
+
+def evaluate_keys_in_parallel(keys):
+	# same as evaluate_keys(), but splits the keys across the worker processes if they were started and there are enough keys
+	keys = list(keys)
+	process_count = get_process_count(len(keys))
+	if executor is None or process_count == 1:
+		return evaluate_keys(keys)
+
+	# split the keys into a few chunks per process and merge the results in the order of the keys, regardless of which worker finishes first
+	chunk_size = -(-len(keys) // (process_count * 4))
+	names_pattern = namefinder.get_pattern().pattern
+	futures = []
+	for i in range(0, len(keys), chunk_size):
+		chunk = keys[i:i + chunk_size]
+		# only send the strings of this chunk
+		inputs = {
+			"original": {key: data["original"][key] for key in chunk if key in data["original"]},
+			"pending": {key: data["pending"][key] for key in chunk},
+			"mcnames": {key: data["mcnames"][key] for key in chunk if key in data["mcnames"]},
+			"feature_names": data["feature_names"],
+		}
+		futures.append(executor.submit(evaluate_chunk, inputs, names_pattern, chunk))
+	evaluations = {}
+	for future in futures:
+		chunk_evaluations, chunk_times = future.result()
+		evaluations.update(chunk_evaluations)
+		for name, seconds in chunk_times.items():
+			rule_times[name] += seconds
+	return evaluations
+
+def print_times():
+	total = sum(rule_times.values())
+	print(f"Rules took {total * 1000:.0f}ms: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in rule_times.items()))
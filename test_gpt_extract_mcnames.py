@@ -0,0 +1,108 @@
+"""
+Tests for gpt_extract_mcnames.py that don't send any requests. Run with: python -m unittest test_gpt_extract_mcnames
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import langfiles
+import gpt_extract_mcnames
+
+def make_result(arguments):
+	return {"choices": [{"message": {"function_call": {"arguments": json.dumps(arguments)}}}]}
+
+def make_names(original, translation):
+	return [{"original": original, "translation": translation, "original_singular": original}]
+
+class McnamesTestCase(unittest.TestCase):
+	def setUp(self):
+		# run in an empty folder with two strings loaded, and without any results from earlier tests
+		self.old_cwd = os.getcwd()
+		self.folder = tempfile.TemporaryDirectory()
+		os.chdir(self.folder.name)
+		self.old_langfiles = (langfiles.original, langfiles.pending, langfiles.langcode)
+		langfiles.original = {"a": "Place a Chest.", "b": "Drop the Diamond."}
+		langfiles.pending = {"a": "Platziere eine Truhe.", "b": "Lass den Diamanten fallen."}
+		langfiles.langcode = "de_de"
+
+	def tearDown(self):
+		langfiles.original, langfiles.pending, langfiles.langcode = self.old_langfiles
+		os.chdir(self.old_cwd)
+		self.folder.cleanup()
+
+class ParseAnalysisTest(McnamesTestCase):
+	def test_malformed_names_in_batch_are_dropped(self):
+		result = make_result({"items": [
+			{"id": 1, "names": ["Chest", "Truhe"]},
+			{"id": 2, "names": make_names("Diamond", "Diamanten")},
+		]})
+		self.assertEqual(gpt_extract_mcnames.parse_analysis(["a", "b"], result), {"b": make_names("Diamond", "Diamanten")})
+
+	def test_names_without_strings_are_dropped(self):
+		result = make_result({"items": [
+			{"id": 1, "names": [{"original": "Chest", "translation": None}]},
+			{"id": 2, "names": [{"original": 5, "translation": "Diamanten"}]},
+		]})
+		self.assertEqual(gpt_extract_mcnames.parse_analysis(["a", "b"], result), {})
+
+	def test_malformed_single_response_raises(self):
+		with self.assertRaises(ValueError):
+			gpt_extract_mcnames.parse_analysis(["a"], make_result({"names": ["Chest"]}))
+
+	def test_malformed_batch_item_is_requested_again(self):
+		# the first reply has a list of strings for "a", which only gets requested again on its own
+		responses = {
+			("a", "b"): make_result({"items": [{"id": 1, "names": ["Chest"]}, {"id": 2, "names": make_names("Diamond", "Diamanten")}]}),
+			("a",): make_result({"names": make_names("Chest", "Truhe")}),
+		}
+		def request_analysis(pairs):
+			chats, _ = gpt_extract_mcnames.get_chats()
+			return responses[tuple(key for key in chats if chats[key] in pairs)]
+		cache = {}
+		with mock.patch.object(gpt_extract_mcnames, "request_analysis", side_effect=request_analysis) as request:
+			gpt_extract_mcnames.analyze_mcnames(cache)
+		_, fingerprints = gpt_extract_mcnames.get_chats()
+		self.assertEqual(request.call_count, 2)
+		self.assertEqual(cache[fingerprints["a"]], make_names("Chest", "Truhe"))
+		self.assertEqual(cache[fingerprints["b"]], make_names("Diamond", "Diamanten"))
+
+class MigrateLegacyCacheTest(McnamesTestCase):
+	def setUp(self):
+		# the files that an older version made mcnames.json from, with mcnames.json written last
+		super().setUp()
+		os.makedirs("cache/lang/wurst")
+		os.makedirs("cache/chatgpt")
+		self.write_json("cache/lang/wurst/en_us.json", langfiles.original, 100)
+		self.write_json("pending.json", langfiles.pending, 100)
+		with open("pending_lang.txt", "w", encoding="utf-8") as f:
+			f.write(langfiles.langcode)
+		os.utime("pending_lang.txt", (100, 100))
+		self.write_json(gpt_extract_mcnames.LEGACY_CACHE_PATH, {"a": make_names("Chest", "Truhe"), "b": make_names("Diamond", "Diamanten")}, 200)
+
+	def write_json(self, path, data, mtime):
+		with open(path, "w", encoding="utf-8") as f:
+			json.dump(data, f)
+		os.utime(path, (mtime, mtime))
+
+	def test_migrated_results_need_no_requests(self):
+		cache = gpt_extract_mcnames.load_cache()
+		self.assertFalse(os.path.exists(gpt_extract_mcnames.LEGACY_CACHE_PATH))
+		self.assertEqual(gpt_extract_mcnames.get_missing_keys(cache), [])
+		with mock.patch.object(gpt_extract_mcnames, "request_analysis") as request:
+			gpt_extract_mcnames.analyze_mcnames(cache)
+		self.assertEqual(request.call_count, 0)
+		_, fingerprints = gpt_extract_mcnames.get_chats()
+		self.assertEqual(cache[fingerprints["a"]], make_names("Chest", "Truhe"))
+		self.assertEqual(gpt_extract_mcnames.load_cache(), cache)
+
+	def test_results_of_changed_files_are_not_migrated(self):
+		# pending.json changed after mcnames.json was written, so the old results might not match it anymore
+		os.utime("pending.json", (300, 300))
+		cache = gpt_extract_mcnames.load_cache()
+		self.assertFalse(os.path.exists(gpt_extract_mcnames.LEGACY_CACHE_PATH))
+		self.assertEqual(cache, {})
+		self.assertEqual(gpt_extract_mcnames.get_missing_keys(cache), ["a", "b"])
+
+if __name__ == "__main__":
+	unittest.main()
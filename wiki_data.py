@@ -3,13 +3,22 @@ Loads the wiki data export file, either from the current directory or directly f
 """
 import os
 import json
+import threading
 from dotenv import load_dotenv
 
-load_dotenv()
-if "WURST_FOLDER" not in os.environ:
-	file_path = "wiki-data.json"
-else:
-	file_path = os.path.join(os.environ["WURST_FOLDER"], "wiki-data.json")
+wiki_data = None
+wiki_data_lock = threading.Lock()
 
-with open(file_path, "r", encoding="utf-8") as f:
-	wiki_data = json.load(f)
+def get_wiki_data():
+	global wiki_data
+	with wiki_data_lock:
+		if wiki_data is None:
+			load_dotenv()
+			if "WURST_FOLDER" not in os.environ:
+				file_path = "wiki-data.json"
+			else:
+				file_path = os.path.join(os.environ["WURST_FOLDER"], "wiki-data.json")
+
+			with open(file_path, "r", encoding="utf-8") as f:
+				wiki_data = json.load(f)
+	return wiki_data
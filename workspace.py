@@ -0,0 +1,9 @@
+"""
+Keeps track of the directory that holds the files of the translation being analyzed: pending.json, pending_lang.txt, table.html and the cached evaluations. It's the current directory unless batch_make_tables.py gives each pull request its own workspace. All other caches don't belong to a single translation, so they stay shared.
+"""
+import os
+
+directory = "."
+
+def get_path(name):
+	return os.path.join(directory, name)